@@ -0,0 +1,79 @@
+import threading
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication, JWTStatelessUserAuthentication
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings
+
+User = get_user_model()
+
+# Profile claims copied into every token so requests can be authorised without a DB hit.
+# "claims_at" records when they were read; refreshed access tokens inherit it.
+def add_user_claims(token, user):
+    token["role"] = user.role
+    token["name"] = user.name
+    token["claims_at"] = time.time()
+    return token
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        return add_user_claims(super().get_token(user), user)
+
+class RevocationCache:
+    """Per-worker view of users changed recently enough to still hold live tokens.
+
+    An access token refreshed just before its refresh token expires keeps the original
+    claims_at and lives one more access lifetime, so only users updated within both
+    lifetimes (plus one reload interval) can still hold tokens issued before the change.
+    One small query per refresh interval then covers deactivation, role changes and
+    password resets. Local changes call invalidate() to take effect immediately.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._changed = {}
+        self._loaded_at = None
+
+    def _load(self):
+        window = (api_settings.ACCESS_TOKEN_LIFETIME + api_settings.REFRESH_TOKEN_LIFETIME
+                  + timedelta(seconds=settings.JWT_REVOCATION_REFRESH_SECONDS))
+        cutoff = timezone.now() - window
+        rows = User.objects.filter(updated_at__gte=cutoff).values_list("id", "updated_at", "is_active")
+        self._changed = {str(pk): (updated_at.timestamp(), is_active) for pk, updated_at, is_active in rows}
+        self._loaded_at = time.monotonic()
+
+    def get(self, user_id):
+        with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at > settings.JWT_REVOCATION_REFRESH_SECONDS:
+                self._load()
+            return self._changed.get(str(user_id))
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+revocation_cache = RevocationCache()
+
+class ClaimsJWTAuthentication(JWTStatelessUserAuthentication):
+    """Authenticate from token claims (role, name) instead of loading accounts.User.
+
+    Tokens issued before the claims existed fall back to the regular database lookup.
+    """
+
+    def get_user(self, validated_token):
+        if "role" not in validated_token or "claims_at" not in validated_token:
+            return JWTAuthentication.get_user(self, validated_token)
+        user = super().get_user(validated_token)
+        changed = revocation_cache.get(user.id)
+        if changed:
+            updated_at, is_active = changed
+            if not is_active:
+                raise AuthenticationFailed("User is inactive", code="user_inactive")
+            if validated_token["claims_at"] < updated_at:
+                raise AuthenticationFailed("User changed since the token was issued; log in again.", code="token_revoked")
+        return user
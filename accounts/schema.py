@@ -0,0 +1,10 @@
+"""OpenAPI description of the claims-based JWT authentication.
+
+Imported by grocery_graph.schema when the schema is generated, so drf-spectacular stays
+off the worker's startup path.
+"""
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+
+class ClaimsJWTScheme(SimpleJWTScheme):
+    # same bearer token on the wire, so it keeps the jwtAuth scheme name
+    target_class = "accounts.authentication.ClaimsJWTAuthentication"
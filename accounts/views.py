@@ -1,5 +1,9 @@
-from rest_framework import generics, permissions
+from datetime import date
+from rest_framework import generics, permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from django.contrib.auth import get_user_model
+from groceries.backends import get_backend
 from .serializers import UserCreateSerializer, UserDetailSerializer
 from .permissions import IsAdminRole
 from .serializers import UserAdminUpdateSerializer
@@ -22,7 +26,24 @@ class MeView(generics.RetrieveAPIView):
     serializer_class = UserDetailSerializer
     permission_classes = [permissions.IsAuthenticated]
     def get_object(self):
-        return self.request.user
+        # request.user is built from token claims; the profile itself lives in the DB
+        return User.objects.get(pk=self.request.user.id)
+
+MY_GROCERIES_FIELDS = ("uid","name","location","created_at","updated_at",
+                       "item_count","deleted_item_count","income_count","income_total")
+
+class MyGroceriesView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        try:
+            # normalized, since stored dates are compared as YYYY-MM-DD strings and fromisoformat also takes 20250301
+            date_from, date_to = (date.fromisoformat(d).isoformat() if d else None
+                                  for d in (request.query_params.get("from"), request.query_params.get("to")))
+        except ValueError:
+            return Response({"detail":"from/to must be YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
+        rows = get_backend().my_grocery_rows(request.user.id, date_from, date_to)
+        return Response({"from": date_from, "to": date_to, "groceries": [dict(zip(MY_GROCERIES_FIELDS, row)) for row in rows]})
 
 class UserDetailAdminView(generics.RetrieveUpdateDestroyAPIView):
     queryset = User.objects.all()
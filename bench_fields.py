@@ -0,0 +1,71 @@
+"""Compare full vs sparse (?fields=) item list responses: bytes on the wire and latency.
+
+python bench_fields.py --base http://localhost:80 --admin-username admin --admin-password password123 \
+    --items 5000 --fields uid,name,price
+"""
+import argparse
+import statistics
+import sys
+import time
+from smoke_test import Client, APIError, _rand
+
+
+def seed(c: Client, grocery_uid: str, n: int):
+    path = f"/api/groceries/{grocery_uid}/items/"
+    for start in range(0, n, 100):
+        ops = [{"method": "POST", "path": path, "body": {
+            "name": f"Item-{i}-{_rand()}", "item_type": "food", "item_location": "aisle 4, second shelf", "price": i / 100,
+        }} for i in range(start, min(start + 100, n))]
+        c.post("/api/batch/", {"mode": "atomic", "operations": ops}, expect=200)
+
+
+def measure(c: Client, path: str, runs: int):
+    sizes, times = [], []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        r = c.session.get(f"{c.base}{path}")
+        times.append((time.perf_counter() - t0) * 1000)
+        if r.status_code != 200:
+            raise APIError(f"GET {path} -> {r.status_code} {r.text}")
+        sizes.append(len(r.content))
+    return sizes[-1], statistics.median(times), statistics.quantiles(times, n=20)[-1] if runs >= 2 else times[0]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--base", default="http://localhost:8000", help="Base URL for API")
+    ap.add_argument("--admin-username", required=True, help="Admin username")
+    ap.add_argument("--admin-password", required=True, help="Admin password")
+    ap.add_argument("--grocery", help="Existing grocery uid to read; a new one is created and seeded if omitted")
+    ap.add_argument("--items", type=int, default=5000, help="Items to seed into a new grocery")
+    ap.add_argument("--fields", default="uid,name,price", help="Sparse fieldset to compare against the full list")
+    ap.add_argument("--runs", type=int, default=20, help="Requests per variant")
+    args = ap.parse_args()
+
+    c = Client(args.base)
+    c.set_token(c.login(args.admin_username, args.admin_password))
+
+    grocery_uid = args.grocery
+    if not grocery_uid:
+        grocery_uid = c.create_grocery(name=f"Bench-{_rand()}", location="Bench")["uid"]
+        print(f"Seeding {args.items} items into grocery {grocery_uid}...")
+        seed(c, grocery_uid, args.items)
+
+    path = f"/api/groceries/{grocery_uid}/items/"
+    full = measure(c, path, args.runs)
+    sparse = measure(c, f"{path}?fields={args.fields}", args.runs)
+    print(f"{'variant':<28}{'bytes':>12}{'p50 ms':>10}{'p95 ms':>10}")
+    print(f"{'full':<28}{full[0]:>12}{full[1]:>10.1f}{full[2]:>10.1f}")
+    print(f"{'fields=' + args.fields:<28}{sparse[0]:>12}{sparse[1]:>10.1f}{sparse[2]:>10.1f}")
+    print(f"saved: {100 * (1 - sparse[0] / full[0]):.1f}% bytes, {100 * (1 - sparse[1] / full[1]):.1f}% p50 latency")
+
+    if not args.grocery:
+        c.delete_grocery(grocery_uid)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except APIError as e:
+        print(f"\nFAILED ❌  {e}")
+        sys.exit(1)
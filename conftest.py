@@ -0,0 +1,35 @@
+import os
+import pytest
+
+TEST_GRAPH_BACKEND = os.getenv("TEST_GRAPH_BACKEND", "memory")
+
+def pytest_configure(config):
+    if TEST_GRAPH_BACKEND == "memory":
+        return
+    # the Neo4j run wipes the whole graph before each test, so workers would delete each other's data
+    if config.getoption("numprocesses", None):
+        raise pytest.UsageError("TEST_GRAPH_BACKEND=neo4j runs must be serial (drop -n).")
+    # ...and must never wipe the app's own database, which NEOMODEL_NEO4J_BOLT_URL points at by default
+    from django.conf import settings
+    url = os.getenv("TEST_NEO4J_BOLT_URL")
+    if not url or url == settings.NEOMODEL_NEO4J_BOLT_URL:
+        raise pytest.UsageError("TEST_GRAPH_BACKEND=neo4j needs TEST_NEO4J_BOLT_URL set to a throwaway database "
+                                "other than NEOMODEL_NEO4J_BOLT_URL.")
+    from neomodel import config as neomodel_config
+    settings.NEOMODEL_NEO4J_BOLT_URL = neomodel_config.DATABASE_URL = url
+
+@pytest.fixture(autouse=True)
+def graph_backend(settings):
+    """Each test starts from an empty graph: a fresh in-memory one, or with TEST_GRAPH_BACKEND=neo4j
+    the database in TEST_NEO4J_BOLT_URL emptied first."""
+    settings.GRAPH_BACKEND = TEST_GRAPH_BACKEND
+    settings.PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]  # test users only
+    from groceries.backends import get_backend
+    backend = get_backend()
+    if TEST_GRAPH_BACKEND == "memory":
+        backend.reset()
+    else:
+        from neomodel import db
+        # also drops UserNodes, whose ids SQLite hands out again after each test's rollback
+        db.cypher_query("MATCH (n) DETACH DELETE n")
+    return backend
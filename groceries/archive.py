@@ -0,0 +1,22 @@
+"""Retention for soft-deleted items.
+
+Soft-deleted items older than ITEM_ARCHIVE_AFTER_DAYS are moved off the hot path: the
+HAS_ITEM relationship becomes HAS_ARCHIVED_ITEM and the ItemNode label is swapped for
+ArchivedItem, so item listings no longer traverse them. They remain reachable through
+`?include_deleted=1`, which adds an explicit archive query.
+"""
+import time
+from django.conf import settings
+from .backends import get_backend
+
+def archive_deleted_items(days=None, batch_size=None):
+    """Archive soft-deleted items older than `days`, one bounded transaction per batch."""
+    days = settings.ITEM_ARCHIVE_AFTER_DAYS if days is None else days
+    limit = batch_size or settings.ITEM_ARCHIVE_BATCH_SIZE
+    now = time.time()
+    total = 0
+    while True:
+        n = get_backend().archive_batch(now - days * 86400, now, limit)
+        total += n
+        if n < limit:
+            return total
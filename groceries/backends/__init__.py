@@ -0,0 +1,31 @@
+"""Pluggable graph storage.
+
+Views, serializers and the maintenance jobs never talk to Neo4j directly; they call the
+backend selected by GRAPH_BACKEND: "neo4j" (neomodel + Cypher, the default), "memory"
+(an in-process graph used by the test suite) or a dotted path to another class with the
+same methods. Read methods return raw records in the column order documented on
+Neo4jBackend, so the row/encoder layer in rows.py works unchanged on either backend.
+"""
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+ALIASES = {
+    "neo4j": "groceries.backends.neo4j.Neo4jBackend",
+    "memory": "groceries.backends.memory.MemoryBackend",
+}
+
+# child kind -> (relationship from the grocery, label); purge progress is counted as purged_<kind>
+CHILDREN = {
+    "items": ("HAS_ITEM", "ItemNode"),
+    "incomes": ("RECORDED", "DailyIncomeNode"),
+    "archived_items": ("HAS_ARCHIVED_ITEM", "ArchivedItem"),
+}
+
+_instances = {}
+
+def get_backend():
+    path = ALIASES.get(settings.GRAPH_BACKEND, settings.GRAPH_BACKEND)
+    backend = _instances.get(path)
+    if backend is None:
+        backend = _instances.setdefault(path, import_string(path)())
+    return backend
@@ -0,0 +1,337 @@
+"""In-process graph backend for tests and local development without Neo4j.
+
+Nodes are plain dicts keyed by label and uid, and relationships are adjacency lists
+indexed in both directions. Stored values are kept in their Neo4j form (datetimes as
+epoch seconds), so rows read here match what the Cypher projections return. One lock
+guards the whole store; a write transaction holds it and restores a snapshot on error.
+"""
+import copy
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import date, datetime, timezone
+from .. import series
+from . import CHILDREN
+
+_BASE = {"created_at": None, "updated_at": None}
+_DEFAULTS = {
+    "GroceryNode": {"deleting_at": None},
+    "ItemNode": {"is_deleted": False, "deleted_at": None},
+    "ArchivedItem": {"is_deleted": False, "deleted_at": None},
+    "DailyIncomeNode": {},
+    "TombstoneNode": {},
+}
+# stored as epoch seconds, handed out as aware UTC datetimes like neomodel's DateTimeProperty
+_DATETIMES = ("deleted_at",)
+_EPOCH = datetime(1970, 1, 1)
+
+def _deflate(value):
+    if isinstance(value, datetime):
+        return value.timestamp() if value.tzinfo else (value - _EPOCH).total_seconds()
+    return value
+
+class MemoryNode:
+    """Detached copy of a stored node; `save()`/`touch()` write it back."""
+
+    def __init__(self, backend, label, **attrs):
+        self._backend = backend
+        self._label = label
+        self.uid = attrs.pop("uid", None) or uuid.uuid4().hex
+        for k, v in {**_BASE, **_DEFAULTS[label], **attrs}.items():
+            setattr(self, k, v)
+
+    def _attrs(self):
+        return {k: (_deflate(v) if k in _DATETIMES else v) for k, v in vars(self).items() if not k.startswith("_")}
+
+    def save(self):
+        self._backend._store(self._label, self._attrs())
+        return self
+
+    def touch(self):
+        self.updated_at = time.time()
+        if not self.created_at:
+            self.created_at = self.updated_at
+        return self.save()
+
+class MemoryBackend:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._nodes = {label: {} for label in _DEFAULTS}
+            self._users = {}
+            self._out = {}
+            self._in = {}
+
+    # ---- storage primitives
+    def _store(self, label, attrs):
+        with self._lock:
+            self._nodes[label][attrs["uid"]] = {**self._nodes[label].get(attrs["uid"], {}), **attrs}
+
+    def _node(self, label, uid):
+        with self._lock:
+            attrs = self._nodes[label].get(uid)
+            if attrs is None:
+                return None
+            attrs = dict(attrs)
+        for k in _DATETIMES:
+            if attrs.get(k) is not None:
+                attrs[k] = datetime.fromtimestamp(attrs[k], tz=timezone.utc)
+        return MemoryNode(self, label, **attrs)
+
+    def _link(self, rel, a, b):
+        self._out.setdefault((rel, a), []).append(b)
+        self._in.setdefault((rel, b), []).append(a)
+
+    def _unlink(self, rel, a, b):
+        self._out[(rel, a)].remove(b)
+        self._in[(rel, b)].remove(a)
+
+    def _targets(self, rel, a):
+        return list(self._out.get((rel, a), ()))
+
+    def _sources(self, rel, b):
+        return list(self._in.get((rel, b), ()))
+
+    def _detach_delete(self, label, uid):
+        self._nodes[label].pop(uid, None)
+        for (rel, a) in [k for k in self._out if k[1] == uid]:
+            for b in self._out.pop((rel, a)):
+                self._in[(rel, b)].remove(a)
+        for (rel, b) in [k for k in self._in if k[1] == uid]:
+            for a in self._in.pop((rel, b)):
+                self._out[(rel, a)].remove(b)
+
+    @contextmanager
+    def write_transaction(self):
+        with self._lock:
+            snapshot = copy.deepcopy((self._nodes, self._users, self._out, self._in))
+            try:
+                yield
+            except BaseException:
+                self._nodes, self._users, self._out, self._in = snapshot
+                raise
+
+    # ---- single nodes
+    def get_grocery(self, uid):
+        return self._node("GroceryNode", uid)
+
+    def get_item(self, uid):
+        return self._node("ItemNode", uid)
+
+    def grocery_has_item(self, grocery, item):
+        with self._lock:
+            return item.uid in self._out.get(("HAS_ITEM", grocery.uid), ())
+
+    def user_exists(self, user_id):
+        return str(user_id) in self._users
+
+    def is_responsible(self, user_id, grocery_uid):
+        with self._lock:
+            return grocery_uid in self._out.get(("RESPONSIBLE_FOR", str(user_id)), ())
+
+    def _responsible(self, grocery_uid):
+        owners = self._sources("RESPONSIBLE_FOR", grocery_uid)
+        return owners[0] if owners else None
+
+    def responsible_supplier_id(self, grocery):
+        with self._lock:
+            return self._responsible(grocery.uid)
+
+    def sync_user(self, user_id, name, email, role):
+        with self._lock:
+            now = time.time()
+            user = self._users.setdefault(str(user_id), {"uid": uuid.uuid4().hex, "created_at": now})
+            user.update(name=name, email=email, role=role, updated_at=now)
+
+    def create_grocery(self, fields, manager_id=None, supplier_id=None):
+        with self._lock:
+            grocery = MemoryNode(self, "GroceryNode", **fields).save()
+            if manager_id and str(manager_id) in self._users:
+                self._link("MANAGES", str(manager_id), grocery.uid)
+            if supplier_id:
+                self._link("RESPONSIBLE_FOR", str(supplier_id), grocery.uid)
+            return grocery.touch()
+
+    def set_responsible(self, grocery, supplier_id):
+        with self._lock:
+            for user_id in self._sources("RESPONSIBLE_FOR", grocery.uid):
+                self._unlink("RESPONSIBLE_FOR", user_id, grocery.uid)
+            if supplier_id:
+                self._link("RESPONSIBLE_FOR", str(supplier_id), grocery.uid)
+
+    def create_item(self, grocery, fields):
+        with self._lock:
+            now = time.time()
+            item = MemoryNode(self, "ItemNode", created_at=now, updated_at=now, **fields).save()
+            self._link("HAS_ITEM", grocery.uid, item.uid)
+            return item
+
+    def create_income(self, grocery, amount, date):
+        with self._lock:
+            income = MemoryNode(self, "DailyIncomeNode", amount=amount, date=date).save()
+            self._link("RECORDED", grocery.uid, income.uid)
+            return income
+
+    def mark_deleting(self, grocery):
+        with self.write_transaction():
+            grocery.deleting_at = time.time()
+            grocery.save()
+            MemoryNode(self, "TombstoneNode", kind="grocery", ref_uid=grocery.uid).touch()
+
+    # ---- read queries; same columns as the Cypher in Neo4jBackend
+    def _live_grocery(self, uid):
+        g = self._nodes["GroceryNode"].get(uid)
+        return g if g and g["deleting_at"] is None else None
+
+    def _project(self, res, node):
+        out = []
+        for f in res.spec:
+            if f[0] == "responsible_supplier_id":
+                out.append(self._responsible(node["uid"]))
+            elif f[1] == "bool":
+                out.append(node.get(f[0]) or False)
+            else:
+                out.append(node.get(f[0]))
+        return out
+
+    def grocery_rows(self, res):
+        with self._lock:
+            return [self._project(res, g) for g in self._nodes["GroceryNode"].values() if g["deleting_at"] is None]
+
+    def grocery_detail_rows(self, res, uid):
+        with self._lock:
+            g = self._live_grocery(uid)
+            return [self._project(res, g)] if g else []
+
+    def grocery_item_rows(self, res, uid, include_deleted):
+        with self._lock:
+            if not self._live_grocery(uid):
+                return []
+            items = [self._nodes["ItemNode"][i] for i in self._targets("HAS_ITEM", uid)]
+            rows = [[True] + self._project(res, i) for i in items if include_deleted or not i["is_deleted"]]
+            if include_deleted:
+                rows += [[True] + self._project(res, self._nodes["ArchivedItem"][i]) for i in self._targets("HAS_ARCHIVED_ITEM", uid)]
+            return rows or [[False] + [None] * len(res.spec)]
+
+    def _incomes(self, uid, date_from, date_to):
+        return [d for d in (self._nodes["DailyIncomeNode"][i] for i in self._targets("RECORDED", uid))
+                if (date_from is None or d["date"] >= date_from) and (date_to is None or d["date"] <= date_to)]
+
+    def grocery_income_rows(self, res, uid, date_from, date_to):
+        with self._lock:
+            return [[d["amount"]] + self._project(res, d) for d in self._incomes(uid, date_from, date_to)]
+
+    def changed_rows(self, grocery_res, item_res, since, until, limit):
+        def changed(label, live=lambda n: True):
+            nodes = sorted((n for n in self._nodes[label].values()
+                            if n["updated_at"] is not None and since < n["updated_at"] <= until and live(n)), key=lambda n: n["updated_at"])
+            # rows tying with the last one of the page come along, as in the Cypher
+            return [n for n in nodes if n["updated_at"] <= nodes[limit - 1]["updated_at"]] if len(nodes) > limit else nodes
+        with self._lock:
+            groceries = [[g["updated_at"]] + self._project(grocery_res, g) for g in changed("GroceryNode", lambda g: g["deleting_at"] is None)]
+            items = []
+            for i in changed("ItemNode"):
+                owner = self._sources("HAS_ITEM", i["uid"])
+                items.append([i["updated_at"], owner[0] if owner else None] + self._project(item_res, i))
+            tombstones = [[t["updated_at"], t["kind"], t["ref_uid"]] for t in changed("TombstoneNode")]
+            return groceries, items, tombstones
+
+    def my_grocery_rows(self, user_id, date_from, date_to):
+        with self._lock:
+            rows = []
+            for uid in self._targets("RESPONSIBLE_FOR", str(user_id)):
+                g = self._live_grocery(uid)
+                if not g:
+                    continue
+                items = [self._nodes["ItemNode"][i] for i in self._targets("HAS_ITEM", uid)]
+                deleted = sum(1 for i in items if i["is_deleted"]) + len(self._targets("HAS_ARCHIVED_ITEM", uid))
+                incomes = self._incomes(uid, date_from, date_to)
+                rows.append([g["uid"], g["name"], g["location"], g["created_at"], g["updated_at"],
+                             len(items) - sum(1 for i in items if i["is_deleted"]), deleted,
+                             len(incomes), float(sum(d["amount"] for d in incomes))])
+            return sorted(rows, key=lambda r: r[1])
+
+    def income_series_rows(self, bucket, uids, date_from, date_to):
+        with self._lock:
+            sums = {}
+            for uid in uids:
+                if not self._live_grocery(uid):
+                    continue
+                for d in self._incomes(uid, date_from, date_to):
+                    key = (uid, series.bucket_start(date.fromisoformat(d["date"]), bucket).isoformat())
+                    total, count = sums.get(key, (0.0, 0))
+                    sums[key] = (total + d["amount"], count + 1)
+            return [(uid, b, total, count) for (uid, b), (total, count) in sums.items()]
+
+    # ---- maintenance
+    def purge_batch(self, uid, kind, limit):
+        rel, label = CHILDREN[kind]
+        with self._lock:
+            g = self._nodes["GroceryNode"].get(uid)
+            if g is None:
+                return 0
+            batch = self._targets(rel, uid)[:limit]
+            for child in batch:
+                self._detach_delete(label, child)
+            g[f"purged_{kind}"] = g.get(f"purged_{kind}", 0) + len(batch)
+            return len(batch)
+
+    def delete_marked_grocery(self, uid):
+        with self._lock:
+            g = self._nodes["GroceryNode"].get(uid)
+            if g and g["deleting_at"] is not None:
+                self._detach_delete("GroceryNode", uid)
+
+    def deletion_progress(self, uid):
+        with self._lock:
+            g = self._nodes["GroceryNode"].get(uid)
+            if g is None:
+                return None
+            return (g["deleting_at"],) + tuple(g.get(f"purged_{kind}", 0) for kind in CHILDREN) \
+                + tuple(len(self._targets(rel, uid)) for rel, _ in CHILDREN.values())
+
+    def grocery_tombstone_time(self, uid):
+        with self._lock:
+            return max((t["updated_at"] for t in self._nodes["TombstoneNode"].values()
+                        if t["kind"] == "grocery" and t["ref_uid"] == uid), default=None)
+
+    def pending_deletions(self):
+        with self._lock:
+            return [uid for uid, g in self._nodes["GroceryNode"].items() if g["deleting_at"] is not None]
+
+    def purge_orphans_batch(self, label, limit):
+        rel = next(rel for rel, child in CHILDREN.values() if child == label)
+        with self._lock:
+            orphans = [uid for uid in self._nodes[label] if not self._in.get((rel, uid))][:limit]
+            for uid in orphans:
+                self._detach_delete(label, uid)
+            return len(orphans)
+
+    def archive_batch(self, cutoff, now, limit):
+        with self._lock:
+            moved = 0
+            for (rel, g_uid), item_uids in list(self._out.items()):
+                if rel != "HAS_ITEM":
+                    continue
+                for uid in list(item_uids):
+                    if moved == limit:
+                        return moved
+                    item = self._nodes["ItemNode"][uid]
+                    if not item["is_deleted"] or item["deleted_at"] is None or item["deleted_at"] >= cutoff:
+                        continue
+                    self._unlink("HAS_ITEM", g_uid, uid)
+                    self._link("HAS_ARCHIVED_ITEM", g_uid, uid)
+                    self._nodes["ArchivedItem"][uid] = {**self._nodes["ItemNode"].pop(uid), "archived_at": now}
+                    moved += 1
+            return moved
+
+    def backfill_updated_at_batch(self, label, limit):
+        with self._lock:
+            missing = [n for n in self._nodes[label].values() if n["updated_at"] is None][:limit]
+            for n in missing:
+                n["updated_at"] = n["created_at"] or time.time()
+            return len(missing)
@@ -0,0 +1,320 @@
+"""Neo4j graph backend: neomodel for single nodes, hand-written Cypher for everything else."""
+import logging
+import time
+from functools import lru_cache
+from django.conf import settings
+from neo4j.exceptions import ServiceUnavailable
+from neomodel import config, db
+from . import CHILDREN
+from ..graph_nodes import GroceryNode, ItemNode, DailyIncomeNode, UserNode, TombstoneNode
+
+# Read queries are built per (sparse) field set so only requested properties leave Neo4j.
+@lru_cache(maxsize=None)
+def grocery_list_query(res):
+    return f"MATCH (g:GroceryNode) WHERE g.deleting_at IS NULL RETURN {res.projection()}"
+
+@lru_cache(maxsize=None)
+def grocery_detail_query(res):
+    return f"MATCH (g:GroceryNode {{uid: $uid}}) WHERE g.deleting_at IS NULL RETURN {res.projection()}"
+
+# One round trip: a missing grocery yields no rows, a grocery without items one row flagged false.
+# Archived items are only read when deleted items were asked for.
+@lru_cache(maxsize=None)
+def grocery_items_query(res, include_deleted=False):
+    query = f"""
+MATCH (g:GroceryNode {{uid: $uid}}) WHERE g.deleting_at IS NULL
+OPTIONAL MATCH (g)-[:HAS_ITEM]->(i:ItemNode)
+WHERE $include_deleted OR NOT coalesce(i.is_deleted, false)
+RETURN i IS NOT NULL AS present, {res.projection()}
+"""
+    if include_deleted:
+        query += f"""UNION ALL
+MATCH (g:GroceryNode {{uid: $uid}})-[:HAS_ARCHIVED_ITEM]->(i:ArchivedItem) WHERE g.deleting_at IS NULL
+RETURN true AS present, {res.projection()}
+"""
+    return query
+
+# amount always comes first so totals work whatever fields were requested
+@lru_cache(maxsize=None)
+def grocery_incomes_query(res):
+    return f"""
+MATCH (:GroceryNode {{uid: $uid}})-[:RECORDED]->(d:DailyIncomeNode)
+WHERE ($from IS NULL OR d.date >= $from) AND ($to IS NULL OR d.date <= $to)
+RETURN d.amount, {res.projection()}
+"""
+
+# Change feed: each stream is an index range scan on updated_at between the client's watermark
+# and $until (now minus the safety lag). A page holds the first $limit rows plus any rows tying
+# with the last of them, so the next page can resume strictly after that timestamp without
+# skipping a tie.
+@lru_cache(maxsize=None)
+def changed_groceries_query(res):
+    return f"""
+MATCH (g:GroceryNode) WHERE g.updated_at > $since AND g.updated_at <= $until AND g.deleting_at IS NULL
+WITH g.updated_at AS t ORDER BY t LIMIT $limit
+WITH max(t) AS boundary
+MATCH (g:GroceryNode) WHERE g.updated_at > $since AND g.updated_at <= boundary AND g.deleting_at IS NULL
+RETURN g.updated_at, {res.projection()} ORDER BY g.updated_at
+"""
+
+@lru_cache(maxsize=None)
+def changed_items_query(res):
+    return f"""
+MATCH (i:ItemNode) WHERE i.updated_at > $since AND i.updated_at <= $until
+WITH i.updated_at AS t ORDER BY t LIMIT $limit
+WITH max(t) AS boundary
+MATCH (i:ItemNode) WHERE i.updated_at > $since AND i.updated_at <= boundary
+OPTIONAL MATCH (g:GroceryNode)-[:HAS_ITEM]->(i)
+RETURN i.updated_at, g.uid, {res.projection()} ORDER BY i.updated_at
+"""
+
+CHANGED_TOMBSTONES_QUERY = """
+MATCH (t:TombstoneNode) WHERE t.updated_at > $since AND t.updated_at <= $until
+WITH t.updated_at AS ts ORDER BY ts LIMIT $limit
+WITH max(ts) AS boundary
+MATCH (t:TombstoneNode) WHERE t.updated_at > $since AND t.updated_at <= boundary
+RETURN t.updated_at, t.kind, t.ref_uid ORDER BY t.updated_at
+"""
+
+# Everything a supplier's landing page needs, aggregated per grocery in one round trip.
+MY_GROCERIES_QUERY = """
+MATCH (:UserNode {user_id: $user_id})-[:RESPONSIBLE_FOR]->(g:GroceryNode)
+WHERE g.deleting_at IS NULL
+CALL {
+    WITH g
+    OPTIONAL MATCH (g)-[:HAS_ITEM]->(i:ItemNode)
+    WITH g, count(CASE WHEN NOT coalesce(i.is_deleted, false) THEN i END) AS item_count,
+            count(CASE WHEN i.is_deleted THEN i END) AS soft_deleted
+    // archived items are soft-deleted too, just off the hot path
+    RETURN item_count, soft_deleted + size([(g)-[:HAS_ARCHIVED_ITEM]->(a:ArchivedItem) | a]) AS deleted_item_count
+}
+CALL {
+    WITH g
+    OPTIONAL MATCH (g)-[:RECORDED]->(d:DailyIncomeNode)
+    WHERE ($from IS NULL OR d.date >= $from) AND ($to IS NULL OR d.date <= $to)
+    RETURN count(d) AS income_count, coalesce(sum(d.amount), 0.0) AS income_total
+}
+RETURN g.uid, g.name, g.location, g.created_at, g.updated_at,
+       item_count, deleted_item_count, income_count, income_total
+ORDER BY g.name
+"""
+
+# bucket -> Cypher expression giving the ISO date the bucket starts on
+BUCKET_EXPR = {
+    "day": "d.date",
+    "week": "toString(date.truncate('week', date(d.date)))",
+    "month": "substring(d.date, 0, 7) + '-01'",
+}
+
+@lru_cache(maxsize=None)
+def income_series_query(bucket):
+    return f"""
+UNWIND $uids AS uid
+MATCH (g:GroceryNode {{uid: uid}})-[:RECORDED]->(d:DailyIncomeNode)
+WHERE g.deleting_at IS NULL AND d.date >= $from AND d.date <= $to
+WITH uid, {BUCKET_EXPR[bucket]} AS bucket, d.amount AS amount
+RETURN uid, bucket, sum(amount), count(*)
+"""
+
+@lru_cache(maxsize=None)
+def purge_batch_query(kind):
+    rel, label = CHILDREN[kind]
+    return f"""
+MATCH (g:GroceryNode {{uid: $uid}})
+CALL {{
+    WITH g
+    MATCH (g)-[:{rel}]->(c:{label})
+    WITH c LIMIT $limit
+    DETACH DELETE c
+    RETURN count(*) AS n
+}}
+SET g.purged_{kind} = coalesce(g.purged_{kind}, 0) + n
+RETURN n
+"""
+
+DELETE_GROCERY_QUERY = "MATCH (g:GroceryNode {uid: $uid}) WHERE g.deleting_at IS NOT NULL DETACH DELETE g"
+DELETION_PROGRESS_QUERY = """
+MATCH (g:GroceryNode {uid: $uid})
+RETURN g.deleting_at,
+       coalesce(g.purged_items, 0), coalesce(g.purged_incomes, 0), coalesce(g.purged_archived_items, 0),
+       size([(g)-[:HAS_ITEM]->(i:ItemNode) | i]), size([(g)-[:RECORDED]->(d:DailyIncomeNode) | d]),
+       size([(g)-[:HAS_ARCHIVED_ITEM]->(a:ArchivedItem) | a])
+"""
+TOMBSTONE_QUERY = "MATCH (t:TombstoneNode {kind: 'grocery', ref_uid: $uid}) RETURN max(t.updated_at)"
+DELETING_QUERY = "MATCH (g:GroceryNode) WHERE g.deleting_at IS NOT NULL RETURN g.uid"
+ORPHAN_QUERIES = {
+    "ItemNode": "MATCH (c:ItemNode) WHERE NOT ()-[:HAS_ITEM]->(c) WITH c LIMIT $limit DETACH DELETE c RETURN count(*)",
+    "DailyIncomeNode": "MATCH (c:DailyIncomeNode) WHERE NOT ()-[:RECORDED]->(c) WITH c LIMIT $limit DETACH DELETE c RETURN count(*)",
+    "ArchivedItem": "MATCH (c:ArchivedItem) WHERE NOT ()-[:HAS_ARCHIVED_ITEM]->(c) WITH c LIMIT $limit DETACH DELETE c RETURN count(*)",
+}
+
+# Items and groceries written before the change feed existed never got an updated_at
+BACKFILL_UPDATED_AT_QUERIES = {
+    label: f"""
+MATCH (n:{label}) WHERE n.updated_at IS NULL
+WITH n LIMIT $limit
+SET n.updated_at = coalesce(n.created_at, timestamp() / 1000.0)
+RETURN count(n)
+"""
+    for label in ("GroceryNode", "ItemNode")
+}
+
+ARCHIVE_BATCH_QUERY = """
+MATCH (g:GroceryNode)-[r:HAS_ITEM]->(i:ItemNode)
+WHERE i.deleted_at < $cutoff AND i.is_deleted
+WITH g, r, i LIMIT $limit
+DELETE r
+CREATE (g)-[:HAS_ARCHIVED_ITEM]->(i)
+REMOVE i:ItemNode
+SET i:ArchivedItem, i.archived_at = $now
+RETURN count(i)
+"""
+
+SYNC_USER_QUERY = """
+// Ensure both labels to match neomodel class resolution
+MERGE (u:UserNode:BaseNode {user_id: $user_id})
+ON CREATE SET
+    u.uid = coalesce(u.uid, replace(toString(randomUUID()), '-', '')),
+    u.created_at = timestamp()/1000.0
+SET
+    u.name = $name,
+    u.email = $email,
+    u.role = $role,
+    u.updated_at = timestamp()/1000.0
+"""
+
+class Neo4jBackend:
+    def __init__(self):
+        # normally done by the django_neomodel app; repeated for custom GRAPH_BACKEND subclasses
+        config.DATABASE_URL = settings.NEOMODEL_NEO4J_BOLT_URL
+
+    def write_transaction(self):
+        return db.write_transaction
+
+    # ---- single nodes
+    def get_grocery(self, uid):
+        try:
+            return GroceryNode.nodes.get(uid=uid)
+        except GroceryNode.DoesNotExist:
+            return None
+
+    def get_item(self, uid):
+        try:
+            return ItemNode.nodes.get(uid=uid)
+        except ItemNode.DoesNotExist:
+            return None
+
+    def grocery_has_item(self, grocery, item):
+        return grocery.items.is_connected(item)
+
+    def user_exists(self, user_id):
+        return UserNode.nodes.filter(user_id=str(user_id)).first_or_none() is not None
+
+    def is_responsible(self, user_id, grocery_uid):
+        try:
+            user = UserNode.nodes.get(user_id=str(user_id))
+            grocery = GroceryNode.nodes.get(uid=grocery_uid)
+        except (UserNode.DoesNotExist, GroceryNode.DoesNotExist):
+            return False
+        return user.responsible_for.is_connected(grocery)
+
+    def responsible_supplier_id(self, grocery):
+        resp = list(grocery.responsible.all())
+        return resp[0].user_id if resp else None
+
+    def sync_user(self, user_id, name, email, role):
+        try:
+            db.cypher_query(SYNC_USER_QUERY, {"user_id": str(user_id), "name": name, "email": email, "role": role})
+        except ServiceUnavailable as e:
+            logging.getLogger(__name__).warning("Neo4j unavailable during user sync: %s", e)
+
+    def create_grocery(self, fields, manager_id=None, supplier_id=None):
+        grocery = GroceryNode(**fields).save()
+        if manager_id:
+            admin_node = UserNode.nodes.filter(user_id=str(manager_id)).first_or_none()
+            if admin_node:
+                admin_node.manages.connect(grocery)
+        supplier_node = UserNode.nodes.filter(user_id=str(supplier_id)).first_or_none() if supplier_id else None
+        if supplier_node:
+            supplier_node.responsible_for.connect(grocery)
+        grocery.touch()
+        return grocery
+
+    def set_responsible(self, grocery, supplier_id):
+        for u in list(grocery.responsible.all()):
+            u.responsible_for.disconnect(grocery)
+        supplier_node = UserNode.nodes.filter(user_id=str(supplier_id)).first_or_none() if supplier_id else None
+        if supplier_node:
+            supplier_node.responsible_for.connect(grocery)
+
+    def create_item(self, grocery, fields):
+        now = time.time()
+        item = ItemNode(created_at=now, updated_at=now, **fields).save()
+        grocery.items.connect(item)
+        return item
+
+    def create_income(self, grocery, amount, date):
+        income = DailyIncomeNode(amount=amount, date=date).save()
+        grocery.incomes.connect(income)
+        return income
+
+    def mark_deleting(self, grocery):
+        with db.write_transaction:
+            grocery.deleting_at = time.time()
+            grocery.save()
+            TombstoneNode(kind="grocery", ref_uid=grocery.uid).touch()
+
+    # ---- read queries; each returns raw records in the column order of its Cypher RETURN
+    def grocery_rows(self, res):
+        return db.cypher_query(grocery_list_query(res))[0]
+
+    def grocery_detail_rows(self, res, uid):
+        return db.cypher_query(grocery_detail_query(res), {"uid": uid})[0]
+
+    def grocery_item_rows(self, res, uid, include_deleted):
+        return db.cypher_query(grocery_items_query(res, include_deleted), {"uid": uid, "include_deleted": include_deleted})[0]
+
+    def grocery_income_rows(self, res, uid, date_from, date_to):
+        return db.cypher_query(grocery_incomes_query(res), {"uid": uid, "from": date_from, "to": date_to})[0]
+
+    def changed_rows(self, grocery_res, item_res, since, until, limit):
+        params = {"since": since, "until": until, "limit": limit}
+        return (
+            db.cypher_query(changed_groceries_query(grocery_res), params)[0],
+            db.cypher_query(changed_items_query(item_res), params)[0],
+            db.cypher_query(CHANGED_TOMBSTONES_QUERY, params)[0],
+        )
+
+    def my_grocery_rows(self, user_id, date_from, date_to):
+        return db.cypher_query(MY_GROCERIES_QUERY, {"user_id": str(user_id), "from": date_from, "to": date_to})[0]
+
+    def income_series_rows(self, bucket, uids, date_from, date_to):
+        return db.cypher_query(income_series_query(bucket), {"uids": uids, "from": date_from, "to": date_to})[0]
+
+    # ---- maintenance
+    def purge_batch(self, uid, kind, limit):
+        rows, _ = db.cypher_query(purge_batch_query(kind), {"uid": uid, "limit": limit})
+        return rows[0][0] if rows else 0
+
+    def delete_marked_grocery(self, uid):
+        db.cypher_query(DELETE_GROCERY_QUERY, {"uid": uid})
+
+    def deletion_progress(self, uid):
+        rows, _ = db.cypher_query(DELETION_PROGRESS_QUERY, {"uid": uid})
+        return rows[0] if rows else None
+
+    def grocery_tombstone_time(self, uid):
+        rows, _ = db.cypher_query(TOMBSTONE_QUERY, {"uid": uid})
+        return rows[0][0] if rows else None
+
+    def pending_deletions(self):
+        return [r[0] for r in db.cypher_query(DELETING_QUERY)[0]]
+
+    def purge_orphans_batch(self, label, limit):
+        return db.cypher_query(ORPHAN_QUERIES[label], {"limit": limit})[0][0][0]
+
+    def archive_batch(self, cutoff, now, limit):
+        return db.cypher_query(ARCHIVE_BATCH_QUERY, {"cutoff": cutoff, "now": now, "limit": limit})[0][0][0]
+
+    def backfill_updated_at_batch(self, label, limit):
+        return db.cypher_query(BACKFILL_UPDATED_AT_QUERIES[label], {"limit": limit})[0][0][0]
@@ -0,0 +1,78 @@
+import threading
+from django.conf import settings
+from .backends import get_backend
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """Share one in-flight execution between concurrent callers of the same key.
+
+    The first caller (the leader) runs the function; callers arriving while it is
+    still running wait for it and receive the same result (or exception).
+    Results are shared objects, so callers must treat them as read-only.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result
+
+    def stats(self):
+        with self._lock:
+            total = self.executions + self.coalesced
+            return {
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls),
+                "coalescing_rate": (self.coalesced / total) if total else 0.0,
+            }
+
+    def reset(self):
+        with self._lock:
+            self.executions = 0
+            self.coalesced = 0
+
+read_flight = SingleFlight()
+
+def coalesced_read(method, *args, scope="authenticated"):
+    """Call a read method of the graph backend, sharing the result with identical concurrent calls.
+
+    `scope` identifies the permission scope the result was computed for; callers with
+    different scopes never share a result even when method and arguments are the same.
+    """
+    read = getattr(get_backend(), method)
+    if not getattr(settings, "GROCERY_READ_COALESCING", True):
+        return read(*args)
+    return read_flight.do((scope, method) + args, lambda: read(*args))
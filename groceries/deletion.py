@@ -0,0 +1,62 @@
+"""Background, batched removal of a grocery and everything hanging off it.
+
+Deleting a grocery only marks it (`deleting_at`) and leaves a tombstone; the request
+returns right away and the worker below removes children in bounded auto-commit
+batches, so a store with years of incomes never needs one huge transaction.
+`manage.py purge_orphans` resumes interrupted deletions and cleans up stray nodes.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from .backends import CHILDREN, get_backend
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="grocery-delete")
+
+def purge_grocery(uid, batch_size=None):
+    """Delete a grocery marked as deleting, one bounded batch of children at a time."""
+    limit = batch_size or settings.GROCERY_DELETE_BATCH_SIZE
+    backend = get_backend()
+    for kind in CHILDREN:
+        while backend.purge_batch(uid, kind, limit) == limit:
+            pass
+    backend.delete_marked_grocery(uid)
+
+def _purge_logged(uid):
+    try:
+        purge_grocery(uid)
+    except Exception:
+        # the grocery stays marked; `manage.py purge_orphans` picks it up again
+        logger.exception("Background delete of grocery %s failed", uid)
+
+def schedule_purge(uid):
+    _executor.submit(_purge_logged, uid)
+
+def deletion_status(uid):
+    """Progress of a grocery deletion, or None if no deletion of `uid` is known."""
+    backend = get_backend()
+    progress = backend.deletion_progress(uid)
+    if not progress:
+        deleted_at = backend.grocery_tombstone_time(uid)
+        return {"uid": uid, "status": "deleted", "deleted_at": deleted_at} if deleted_at else None
+    deleting_at, purged_items, purged_incomes, purged_archived, items_left, incomes_left, archived_left = progress
+    if deleting_at is None:
+        return None
+    return {
+        "uid": uid, "status": "deleting", "deleting_since": deleting_at,
+        "purged": {"items": purged_items, "incomes": purged_incomes, "archived_items": purged_archived},
+        "remaining": {"items": items_left, "incomes": incomes_left, "archived_items": archived_left},
+    }
+
+def pending_deletions():
+    return get_backend().pending_deletions()
+
+def purge_orphans(label, batch_size=None):
+    limit = batch_size or settings.GROCERY_DELETE_BATCH_SIZE
+    total = 0
+    while True:
+        n = get_backend().purge_orphans_batch(label, limit)
+        total += n
+        if n < limit:
+            return total
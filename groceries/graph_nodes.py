@@ -8,7 +8,7 @@ def _uuid():
 class BaseNode(StructuredNode):
     uid = StringProperty(unique_index=True, default=_uuid)  # ← important
     created_at = FloatProperty()
-    updated_at = FloatProperty()
+    updated_at = FloatProperty(index=True)  # change feed scans by watermark
 
     def touch(self):
         import time
@@ -38,6 +38,7 @@ class GroceryNode(BaseNode):
     incomes = RelationshipTo("DailyIncomeNode","RECORDED")
     managed_by = RelationshipFrom("UserNode","MANAGES")
     responsible = RelationshipFrom("UserNode","RESPONSIBLE_FOR")
+    deleting_at = FloatProperty()  # set while the background delete removes its children
 
 class ItemNode(BaseNode):
     name = StringProperty(required=True)
@@ -45,8 +46,13 @@ class ItemNode(BaseNode):
     item_location = StringProperty(required=True)
     price = FloatProperty(required=True)
     is_deleted = BooleanProperty(default=False)
-    deleted_at = DateTimeProperty(default=None)
+    deleted_at = DateTimeProperty(default=None, index=True)  # archival scans by age
 
 class DailyIncomeNode(BaseNode):
     amount = FloatProperty(required=True)
     date = StringProperty(required=True)  # YYYY-MM-DD
+
+class TombstoneNode(BaseNode):
+    # left behind by hard deletes so the change feed can report them
+    kind = StringProperty(required=True, choices={"grocery": "Grocery"})
+    ref_uid = StringProperty(required=True, index=True)
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from groceries.archive import archive_deleted_items
+
+class Command(BaseCommand):
+    help = "Move soft-deleted items past the retention period to the ArchivedItem tier, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=None, help="Archive items deleted more than this many days ago (default ITEM_ARCHIVE_AFTER_DAYS)")
+        parser.add_argument("--batch-size", type=int, default=None, help="Items moved per transaction (default ITEM_ARCHIVE_BATCH_SIZE)")
+
+    def handle(self, *args, days=None, batch_size=None, **options):
+        n = archive_deleted_items(days, batch_size)
+        self.stdout.write(f"Archived {n} soft-deleted items")
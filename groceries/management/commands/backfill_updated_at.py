@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from groceries.backends import get_backend
+
+class Command(BaseCommand):
+    help = "Stamp groceries and items written before the change feed with updated_at (their created_at), in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Nodes stamped per transaction")
+
+    def handle(self, *args, batch_size=1000, **options):
+        for label in ("GroceryNode", "ItemNode"):
+            total = 0
+            while True:
+                n = get_backend().backfill_updated_at_batch(label, batch_size)
+                total += n
+                if n < batch_size:
+                    break
+            self.stdout.write(f"Stamped {total} {label} nodes")
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from grocery_graph.schema import write_artifacts
+
+class Command(BaseCommand):
+    help = "Render the OpenAPI schema once into OPENAPI_SCHEMA_DIR (YAML + JSON, plain and gzipped) for /api/schema/."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--out", default=None, help="Output directory (default OPENAPI_SCHEMA_DIR)")
+
+    def handle(self, *args, out=None, **options):
+        for fmt, artifact in write_artifacts(out).items():
+            self.stdout.write(f"openapi.{fmt}: {len(artifact.body)} bytes, {len(artifact.gzipped)} gzipped, ETag {artifact.etag}")
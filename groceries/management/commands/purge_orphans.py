@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from groceries.backends import CHILDREN
+from groceries.deletion import pending_deletions, purge_grocery, purge_orphans
+
+class Command(BaseCommand):
+    help = "Finish interrupted grocery deletions and remove items/incomes no grocery points to, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None, help="Nodes deleted per transaction (default GROCERY_DELETE_BATCH_SIZE)")
+
+    def handle(self, *args, batch_size=None, **options):
+        for uid in pending_deletions():
+            purge_grocery(uid, batch_size)
+            self.stdout.write(f"Finished deleting grocery {uid}")
+        for _, label in CHILDREN.values():
+            n = purge_orphans(label, batch_size)
+            self.stdout.write(f"Removed {n} orphaned {label} nodes")
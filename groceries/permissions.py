@@ -1,17 +1,12 @@
 from rest_framework.permissions import BasePermission
-from .graph_nodes import UserNode, GroceryNode
+from .backends import get_backend
 
 class IsAdminRole(BasePermission):
     def has_permission(self, request, view):
         return request.user.is_authenticated and request.user.role == "ADMIN"
 
 def user_is_responsible_for_grocery(django_user_id: int, grocery_uid: str) -> bool:
-    try:
-        user = UserNode.nodes.get(user_id=str(django_user_id))
-        grocery = GroceryNode.nodes.get(uid=grocery_uid)
-    except (UserNode.DoesNotExist, GroceryNode.DoesNotExist):
-        return False
-    return user.responsible_for.is_connected(grocery)
+    return get_backend().is_responsible(django_user_id, grocery_uid)
 
 class CanModifyGroceryOrItems(BasePermission):
     def has_permission(self, request, view):
@@ -0,0 +1,109 @@
+"""Serializer-free read path.
+
+List endpoints return thousands of rows, and hydrating a StructuredNode plus a DRF
+serializer per row dominates their CPU time. Here each resource declares its output
+fields once: the Cypher projection that fetches them as plain values, a compact tuple
+row type, and a JSON encoder with pre-escaped keys. The output must stay identical to
+the corresponding serializer in serializers.py.
+"""
+import json
+from collections import namedtuple
+from datetime import datetime, timezone
+from json.encoder import encode_basestring
+from django.http import HttpResponse
+from rest_framework import serializers
+from rest_framework.response import Response
+
+_datetime_field = serializers.DateTimeField()
+
+def _datetime(value):
+    # neomodel stores DateTimeProperty as epoch seconds and inflates it in UTC
+    return _datetime_field.to_representation(datetime.fromtimestamp(value, tz=timezone.utc))
+
+def _supplier_id(value):
+    return int(value) if str(value).isdigit() else value
+
+# kind -> (python value for non-JSON renderers, JSON text)
+_CONVERTERS = {
+    "supplier_id": (_supplier_id, lambda v: json.dumps(_supplier_id(v), ensure_ascii=False)),
+    "str": (str, lambda v: encode_basestring(str(v))),
+    "float": (float, lambda v: float.__repr__(float(v))),
+    "bool": (bool, lambda v: "true" if v else "false"),
+    "datetime": (_datetime, lambda v: encode_basestring(_datetime(v))),
+}
+
+class Resource:
+    """Output fields of one resource: (name, kind) or (name, kind, cypher expression)."""
+
+    def __init__(self, name, var, fields):
+        self.name = name
+        self.var = var
+        self.spec = tuple(fields)
+        self.fields = tuple(f[0] for f in fields)
+        self.row = namedtuple(name.title() + "Row", self.fields)
+        self._python = [_CONVERTERS[f[1]][0] for f in fields]
+        self._json = [(encode_basestring(f[0]) + ":", _CONVERTERS[f[1]][1]) for f in fields]
+        self._subsets = {}
+
+    def select(self, param):
+        """The resource narrowed to a `?fields=a,b` value; None or empty (even `,` or blanks) means all fields."""
+        wanted = {f.strip() for f in (param or "").split(",") if f.strip()}
+        if not wanted:
+            return self
+        unknown = wanted.difference(self.fields)
+        if unknown:
+            raise serializers.ValidationError({"fields": [f"Unknown field(s): {', '.join(sorted(unknown))}. Allowed: {', '.join(self.fields)}."]})
+        key = frozenset(wanted)
+        if key not in self._subsets:
+            self._subsets[key] = Resource(self.name, self.var, [f for f in self.spec if f[0] in wanted])
+        return self._subsets[key]
+
+    def projection(self):
+        """Cypher RETURN items fetching exactly this resource's fields from `var`."""
+        out = []
+        for f in self.spec:
+            if len(f) == 3:
+                out.append(f[2])
+            elif f[1] == "bool":
+                out.append(f"coalesce({self.var}.{f[0]}, false)")
+            else:
+                out.append(f"{self.var}.{f[0]}")
+        return ", ".join(out)
+
+    def rows(self, records, skip=0):
+        # the first `skip` columns of each record are query bookkeeping, not output
+        return [self.row._make(r[skip:]) for r in records]
+
+    def to_dict(self, row):
+        return {f: (None if v is None else conv(v)) for f, conv, v in zip(self.fields, self._python, row)}
+
+    def encode_row(self, row):
+        return "{" + ",".join([key + ("null" if v is None else enc(v)) for (key, enc), v in zip(self._json, row)]) + "}"
+
+    def encode_list(self, rows):
+        return "[" + ",".join([self.encode_row(r) for r in rows]) + "]"
+
+GROCERY = Resource("grocery", "g", (
+    ("uid", "str"), ("name", "str"), ("location", "str"),
+    ("created_at", "float"), ("updated_at", "float"),
+))
+# detail adds the responsible supplier, as GrocerySerializer does
+GROCERY_DETAIL = Resource("grocery", "g", GROCERY.spec + (
+    ("responsible_supplier_id", "supplier_id", "head([(u:UserNode)-[:RESPONSIBLE_FOR]->(g) | u.user_id])"),
+))
+ITEM = Resource("item", "i", (
+    ("uid", "str"), ("name", "str"), ("item_type", "str"), ("item_location", "str"),
+    ("price", "float"), ("is_deleted", "bool"), ("deleted_at", "datetime"),
+))
+INCOME = Resource("income", "d", (
+    ("uid", "str"), ("amount", "float"), ("date", "str"),
+))
+
+def json_response(request, encode, data):
+    """Send `encode()` as-is when the JSON renderer was negotiated, otherwise let DRF render `data()`."""
+    renderer = getattr(request, "accepted_renderer", None)
+    if renderer is not None and renderer.format == "json":
+        # match JSONRenderer: line/paragraph separators are always escaped
+        text = encode().replace("\u2028", "\\u2028").replace("\u2029", "\\u2029")
+        return HttpResponse(text.encode("utf-8"), content_type="application/json")
+    return Response(data())
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .graph_nodes import GroceryNode, ItemNode, DailyIncomeNode, UserNode
+from .backends import get_backend
 
 class GrocerySerializer(serializers.Serializer):
     uid = serializers.CharField(read_only=True)          # ← include uid
@@ -18,10 +18,9 @@ class GrocerySerializer(serializers.Serializer):
         }
         # include responsible supplier id if present (helpful for UI/tests)
         try:
-            resp = list(obj.responsible.all())
-            if resp:
+            rid = get_backend().responsible_supplier_id(obj)
+            if rid:
                 # our graph uses user_id (string) -> cast to int for convenience if possible
-                rid = resp[0].user_id
                 data["responsible_supplier_id"] = int(rid) if str(rid).isdigit() else rid
         except Exception:
             pass
@@ -30,24 +29,15 @@ class GrocerySerializer(serializers.Serializer):
     def create(self, validated_data):
         request = self.context.get("request")
         supplier_id = validated_data.pop("responsible_supplier_id", None)
-
-        grocery = GroceryNode(**validated_data).save()
-
-        # Link admin -> MANAGES (defensive read)
-        if request and getattr(request, "user", None):
-            admin_node = UserNode.nodes.filter(user_id=str(request.user.id)).first()
-            if admin_node:
-                admin_node.manages.connect(grocery)
+        backend = get_backend()
 
         # Link responsible supplier if provided (defensive read)
-        if supplier_id:
-            supplier_node = UserNode.nodes.filter(user_id=str(supplier_id)).first()
-            if not supplier_node:
-                raise serializers.ValidationError("Supplier not found or duplicate user nodes exist; please repair.")
-            supplier_node.responsible_for.connect(grocery)
+        if supplier_id and not backend.user_exists(supplier_id):
+            raise serializers.ValidationError("Supplier not found or duplicate user nodes exist; please repair.")
 
-        grocery.touch()
-        return grocery
+        # Link admin -> MANAGES when the admin has a graph node
+        manager_id = request.user.id if request and getattr(request, "user", None) else None
+        return backend.create_grocery(validated_data, manager_id=manager_id, supplier_id=supplier_id)
 
     def update(self, instance, validated_data):
         supplier_id = validated_data.pop("responsible_supplier_id", None)
@@ -57,14 +47,10 @@ class GrocerySerializer(serializers.Serializer):
 
         # Reassign responsible supplier if provided (clear then connect)
         if supplier_id is not None:
-            # disconnect all
-            for u in list(instance.responsible.all()):
-                u.responsible_for.disconnect(instance)
-            if supplier_id:
-                supplier_node = UserNode.nodes.filter(user_id=str(supplier_id)).first()
-                if not supplier_node:
-                    raise serializers.ValidationError("Supplier not found or duplicate user nodes exist; please repair.")
-                supplier_node.responsible_for.connect(instance)
+            backend = get_backend()
+            if supplier_id and not backend.user_exists(supplier_id):
+                raise serializers.ValidationError("Supplier not found or duplicate user nodes exist; please repair.")
+            backend.set_responsible(instance, supplier_id)
 
         instance.touch()
         return instance
@@ -79,10 +65,7 @@ class ItemSerializer(serializers.Serializer):
     deleted_at = serializers.DateTimeField(read_only=True)
 
     def create(self, validated_data):
-        grocery = self.context["grocery"]
-        item = ItemNode(**validated_data).save()
-        grocery.items.connect(item)
-        return item
+        return get_backend().create_item(self.context["grocery"], validated_data)
 
     def update(self, instance, validated_data):
         for k, v in validated_data.items():
@@ -104,6 +87,4 @@ class DailyIncomeSerializer(serializers.Serializer):
     def create(self, validated_data):
         grocery = self.context["grocery"]
         date_str = validated_data["date"].isoformat() if hasattr(validated_data["date"], "isoformat") else str(validated_data["date"])
-        income = DailyIncomeNode(amount=validated_data["amount"], date=date_str).save()
-        grocery.incomes.connect(income)
-        return income
+        return get_backend().create_income(grocery, validated_data["amount"], date_str)
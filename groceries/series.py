@@ -0,0 +1,80 @@
+"""Time-bucketed income series.
+
+The graph backend does the per-bucket aggregation; the (small) aggregated result is laid out as a
+groceries x buckets matrix, gaps are zero-filled and the derived series (trailing
+moving average, period-over-period deltas) are computed with array operations.
+"""
+from datetime import date, timedelta
+
+BUCKETS = ("day", "week", "month")
+DEFAULT_WINDOW = {"day": 7, "week": 4, "month": 3}
+
+def bucket_start(day, bucket):
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+def bucket_starts(date_from, date_to, bucket):
+    """Every bucket start covering [date_from, date_to], so empty buckets still show up."""
+    out, current = [], bucket_start(date_from, bucket)
+    while current <= date_to:
+        out.append(current.isoformat())
+        if bucket == "day":
+            current += timedelta(days=1)
+        elif bucket == "week":
+            current += timedelta(weeks=1)
+        else:
+            current = (current.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return out
+
+def default_range(bucket, date_to=None):
+    """The last 30 buckets up to today (or `date_to`)."""
+    date_to = date_to or date.today()
+    start = bucket_start(date_to, bucket)
+    for _ in range(29):
+        start = bucket_start(start - timedelta(days=1), bucket)
+    return start, date_to
+
+def _nullable(a):
+    import numpy as np
+    out = a.astype(object)
+    out[np.isnan(a)] = None
+    return out.tolist()
+
+def build_series(uids, buckets, records, window):
+    """Zero-filled totals/counts per grocery plus moving average and deltas, one dict per grocery."""
+    import numpy as np  # only this endpoint needs it; kept off the worker's startup path
+    row = {uid: i for i, uid in enumerate(uids)}
+    col = {b: j for j, b in enumerate(buckets)}
+    totals = np.zeros((len(uids), len(buckets)))
+    counts = np.zeros((len(uids), len(buckets)), dtype=np.int64)
+    if records:
+        uid_col, bucket_col, total_col, count_col = zip(*records)
+        r = np.fromiter((row[u] for u in uid_col), dtype=np.intp, count=len(records))
+        c = np.fromiter((col[b] for b in bucket_col), dtype=np.intp, count=len(records))
+        totals[r, c] = total_col
+        counts[r, c] = count_col
+
+    # trailing moving average from a cumulative sum; undefined until a full window exists
+    moving = np.full(totals.shape, np.nan)
+    if 0 < window <= totals.shape[1]:
+        csum = np.cumsum(totals, axis=1)
+        csum = np.concatenate([np.zeros((totals.shape[0], 1)), csum], axis=1)
+        moving[:, window - 1:] = (csum[:, window:] - csum[:, :-window]) / window
+
+    previous = np.concatenate([np.full((totals.shape[0], 1), np.nan), totals[:, :-1]], axis=1)
+    delta = totals - previous
+    with np.errstate(divide="ignore", invalid="ignore"):
+        delta_pct = np.where(previous > 0, delta / previous * 100, np.nan)
+
+    return [{
+        "grocery_uid": uid,
+        "total": totals[i].tolist(),
+        "count": counts[i].tolist(),
+        "grand_total": float(totals[i].sum()),
+        "moving_average": _nullable(moving[i]),
+        "delta": _nullable(delta[i]),
+        "delta_pct": _nullable(delta_pct[i]),
+    } for i, uid in enumerate(uids)]
@@ -1,3 +1,4 @@
+import os
 import pytest
 from django.contrib.auth import get_user_model
 from rest_framework.test import APIClient
@@ -22,3 +23,385 @@ def test_admin_can_create_supplier_and_grocery():
     supplier_id = resp.json()["id"]
     resp = client.post("/api/groceries/", {"name":"G1","location":"L1","responsible_supplier_id": supplier_id})
     assert resp.status_code == 201
+    grocery = resp.json()["uid"]
+    # an unknown supplier is a 400 on every backend (neomodel's NodeSet.first() raises when nothing matches)
+    assert client.post("/api/groceries/", {"name":"G2","location":"L2","responsible_supplier_id": 999999}).status_code == 400
+    assert client.patch(f"/api/groceries/{grocery}/", {"responsible_supplier_id": 999999}).status_code == 400
+    assert client.get(f"/api/groceries/{grocery}/").json()["responsible_supplier_id"] == supplier_id
+
+def test_single_flight_shares_concurrent_execution():
+    import threading, time
+    from groceries.coalescing import SingleFlight
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+    def slow():
+        calls.append(1)
+        release.wait(2)
+        return ["row"]
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("k", slow))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    while flight.stats()["coalesced"] < 4:
+        time.sleep(0.001)
+    release.set()
+    for t in threads:
+        t.join()
+    assert calls == [1]
+    assert results == [["row"]] * 5
+    assert flight.stats()["in_flight"] == 0
+    # once the leader finished, the next call runs again
+    assert flight.do("k", lambda: ["fresh"]) == ["fresh"]
+
+@pytest.mark.django_db
+def test_change_feed_rejects_bad_watermark():
+    client = _client_for(User.objects.create_user(username="feed", email="feed@example.com", name="Feed", password="pass", role="SUPPLIER"))
+    resp = client.get("/api/changes/?since=yesterday")
+    assert resp.status_code == 400
+
+@pytest.mark.django_db
+def test_my_groceries_rejects_bad_dates():
+    client = _client_for(User.objects.create_user(username="dash", email="dash@example.com", name="Dash", password="pass", role="SUPPLIER"))
+    resp = client.get("/api/accounts/me/groceries/?from=01/02/2025")
+    assert resp.status_code == 400
+
+@pytest.mark.django_db
+def test_atomic_batch_rejects_unsupported_operation():
+    client = _client_for(User.objects.create_user(username="batch", email="batch@example.com", name="Batch", password="pass", role="SUPPLIER"))
+    resp = client.post("/api/batch/", {"mode":"atomic","operations":[{"method":"GET","path":"/api/groceries/"}]}, format="json")
+    assert resp.status_code == 400
+    assert resp.json()["results"][0]["status"] == 405
+
+@pytest.mark.django_db
+def test_claims_token_authenticates_without_user_query(django_assert_num_queries):
+    from accounts.authentication import ClaimsTokenObtainPairSerializer, revocation_cache
+    user = User.objects.create_user(username="claims", email="claims@example.com", name="Claims", password="pass", role="SUPPLIER")
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {ClaimsTokenObtainPairSerializer.get_token(user).access_token}")
+    revocation_cache.invalidate()
+    assert client.get("/api/changes/?since=x").status_code == 400  # loads the revocation cache
+    with django_assert_num_queries(0):
+        assert client.get("/api/changes/?since=x").status_code == 400
+
+@pytest.mark.django_db
+def test_deactivated_user_token_is_rejected():
+    from accounts.authentication import ClaimsTokenObtainPairSerializer
+    user = User.objects.create_user(username="gone", email="gone@example.com", name="Gone", password="pass", role="SUPPLIER")
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {ClaimsTokenObtainPairSerializer.get_token(user).access_token}")
+    assert client.get("/api/changes/?since=x").status_code == 400
+    user.is_active = False
+    user.save()
+    assert client.get("/api/changes/?since=x").status_code == 401
+
+@pytest.mark.django_db
+def test_demoted_user_late_refreshed_token_is_rejected():
+    import time
+    from datetime import timedelta
+    from django.utils import timezone
+    from accounts.authentication import ClaimsTokenObtainPairSerializer
+    user = User.objects.create_user(username="demoted", email="demoted@example.com", name="Demoted", password="pass", role="ADMIN")
+    # logged in 24h30m ago and demoted a minute later; the access token was refreshed at 23h59m
+    # and is still live, while the role change is now older than the refresh lifetime
+    refresh = ClaimsTokenObtainPairSerializer.get_token(user)
+    refresh["claims_at"] = time.time() - 88200
+    user.role = "SUPPLIER"
+    user.save()
+    User.objects.filter(pk=user.pk).update(updated_at=timezone.now() - timedelta(seconds=88140))
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+    assert client.get("/api/changes/?since=x").status_code == 401
+
+def test_row_encoders_match_serializers():
+    from datetime import datetime, timezone
+    from rest_framework.renderers import JSONRenderer
+    from groceries.graph_nodes import ItemNode, DailyIncomeNode
+    from groceries.serializers import ItemSerializer, DailyIncomeSerializer
+    from groceries.rows import ITEM, INCOME
+    deleted = datetime(2025, 3, 1, 12, 30, 15, 250000, tzinfo=timezone.utc)
+    item = ItemNode(uid="i1", name="Çay \"özel\"", item_type="drink", item_location="A1", price=2.5, is_deleted=True, deleted_at=deleted)
+    row = ITEM.row("i1", "Çay \"özel\"", "drink", "A1", 2.5, True, deleted.timestamp())
+    expected = JSONRenderer().render(ItemSerializer(item).data).decode()
+    assert ITEM.encode_row(row) == expected
+    assert ITEM.to_dict(row) == ItemSerializer(item).data
+    live = ITEM.row("i2", "Tea", "drink", "A1", 3.0, False, None)
+    assert ITEM.encode_row(live) == JSONRenderer().render(ItemSerializer(ItemNode(uid="i2", name="Tea", item_type="drink", item_location="A1", price=3.0)).data).decode()
+    income = DailyIncomeNode(uid="d1", amount=10.25, date="2025-03-01")
+    assert INCOME.encode_row(INCOME.row("d1", 10.25, "2025-03-01")) == JSONRenderer().render(DailyIncomeSerializer(income).data).decode()
+
+def test_sparse_fieldset_narrows_cypher_projection():
+    from rest_framework.exceptions import ValidationError
+    from groceries.rows import ITEM
+    from groceries.backends.neo4j import grocery_items_query
+    res = ITEM.select("price, uid,name")
+    assert res.fields == ("uid", "name", "price")
+    assert res is ITEM.select("name,price,uid")
+    query = grocery_items_query(res)
+    assert "i.price" in query and "i.item_location" not in query
+    assert res.encode_row(res.row("i1", "Tea", 3.0)) == '{"uid":"i1","name":"Tea","price":3.0}'
+    with pytest.raises(ValidationError):
+        ITEM.select("uid,cost")
+    assert ITEM.select(",") is ITEM and ITEM.select(" , ") is ITEM
+
+def test_purge_grocery_deletes_children_in_bounded_batches(graph_backend, monkeypatch):
+    from datetime import datetime
+    from groceries import deletion
+    from groceries.archive import archive_deleted_items
+    grocery = graph_backend.create_grocery({"name":"G","location":"L"})
+    for n in range(6):
+        item = graph_backend.create_item(grocery, {"name":f"i{n}","item_type":"t","item_location":"A","price":1.0})
+    item.is_deleted, item.deleted_at = True, datetime.utcnow()
+    item.save()
+    assert archive_deleted_items(days=0) == 1
+    for day in ("2025-01-01", "2025-01-02"):
+        graph_backend.create_income(grocery, 5.0, day)
+    graph_backend.mark_deleting(grocery)
+    calls = []
+    purge_batch = graph_backend.purge_batch
+    monkeypatch.setattr(graph_backend, "purge_batch", lambda *args: calls.append(args[1]) or purge_batch(*args))
+    deletion.purge_grocery(grocery.uid, batch_size=2)
+    # a short batch ends each child kind: 5 items, 2 incomes, 1 archived item
+    assert calls == ["items"] * 3 + ["incomes"] * 2 + ["archived_items"]
+    assert graph_backend.get_grocery(grocery.uid) is None
+    assert deletion.deletion_status(grocery.uid)["status"] == "deleted"
+
+def test_archived_items_only_queried_with_include_deleted():
+    from groceries.rows import ITEM
+    from groceries.backends.neo4j import grocery_items_query
+    assert "ArchivedItem" not in grocery_items_query(ITEM, False)
+    assert "HAS_ARCHIVED_ITEM" in grocery_items_query(ITEM, True)
+
+def test_income_series_gap_fill_and_derived_values():
+    from datetime import date
+    from groceries import series
+    buckets = series.bucket_starts(date(2025, 1, 30), date(2025, 4, 2), "month")
+    assert buckets == ["2025-01-01", "2025-02-01", "2025-03-01", "2025-04-01"]
+    assert series.bucket_starts(date(2025, 1, 1), date(2025, 1, 14), "week") == ["2024-12-30", "2025-01-06", "2025-01-13"]
+    records = [("a", "2025-01-01", 10.0, 2), ("a", "2025-03-01", 30.0, 1), ("b", "2025-02-01", 5.0, 1)]
+    a, b = series.build_series(["a", "b"], buckets, records, window=2)
+    assert a["total"] == [10.0, 0.0, 30.0, 0.0]
+    assert a["count"] == [2, 0, 1, 0]
+    assert a["moving_average"] == [None, 5.0, 15.0, 15.0]
+    assert a["delta"] == [None, -10.0, 30.0, -30.0]
+    assert a["delta_pct"] == [None, -100.0, None, -100.0]
+    assert b["grand_total"] == 5.0
+
+def test_admission_gate_sheds_when_queue_is_full():
+    from grocery_graph.admission import Gate
+    gate = Gate("read", concurrency=1, queue=0, timeout=0.01)
+    assert gate.acquire()
+    assert not gate.acquire()
+    gate.release()
+    assert gate.acquire()
+    assert gate.stats()["rejected"] == 1
+
+def test_admission_bulk_yields_to_queued_reads():
+    import threading, time
+    from grocery_graph.admission import Gate
+    reads = Gate("read", concurrency=1, queue=1, timeout=1.0)
+    bulk = Gate("bulk", concurrency=1, queue=1, timeout=0.1)
+    assert reads.acquire()
+    waiter = threading.Thread(target=reads.acquire)
+    waiter.start()
+    while not reads.stats()["queued"]:
+        time.sleep(0.001)
+    assert not bulk.acquire(yield_to=(reads,))  # a read is queued, so bulk times out
+    reads.release()
+    waiter.join()
+    assert bulk.acquire(yield_to=(reads,))
+
+def test_admission_middleware_returns_503_with_retry_after(monkeypatch):
+    from django.test import RequestFactory
+    from grocery_graph.admission import AdmissionControlMiddleware, Gate, gates
+    middleware = AdmissionControlMiddleware(lambda request: "ok")
+    monkeypatch.setitem(gates, "read", Gate("read", concurrency=0, queue=0, timeout=0.01))
+    resp = middleware(RequestFactory().get("/api/groceries/"))
+    assert resp.status_code == 503 and resp["Retry-After"]
+    assert middleware(RequestFactory().get("/api/stats/")) == "ok"
+
+def _client_for(user):
+    from rest_framework_simplejwt.tokens import RefreshToken
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}")
+    return client
+
+@pytest.fixture
+def supplier_grocery(db):
+    admin = User.objects.create_user(username="boss", email="boss@example.com", name="Boss", password="pass", role="ADMIN")
+    supplier = User.objects.create_user(username="sup", email="sup@example.com", name="Sup", password="pass", role="SUPPLIER")
+    grocery = _client_for(admin).post("/api/groceries/", {"name":"Corner","location":"Main St","responsible_supplier_id": supplier.id}).json()
+    return _client_for(admin), _client_for(supplier), grocery
+
+def test_supplier_manages_items_of_own_grocery(supplier_grocery):
+    admin, supplier, grocery = supplier_grocery
+    path = f"/api/groceries/{grocery['uid']}/items/"
+    assert grocery["responsible_supplier_id"] == User.objects.get(username="sup").id
+    tea = supplier.post(path, {"name":"Tea","item_type":"drink","item_location":"A1","price":3.0}).json()
+    salt = supplier.post(path, {"name":"Salt","item_type":"food","item_location":"B2","price":1.0}).json()
+    assert supplier.patch(f"{path}{tea['uid']}/", {"price":3.5}).json()["price"] == 3.5
+    assert supplier.delete(f"{path}{salt['uid']}/").status_code == 204
+    assert [i["name"] for i in supplier.get(path).json()] == ["Tea"]
+    assert {i["name"] for i in supplier.get(path + "?include_deleted=1").json()} == {"Tea", "Salt"}
+    assert supplier.get(path + "?fields=uid,price").json() == [{"uid":tea["uid"],"price":3.5}]
+    assert supplier.get(path + "?fields=,").json() == supplier.get(path).json()
+    other = _client_for(User.objects.create_user(username="other", email="o@example.com", name="O", password="pass", role="SUPPLIER"))
+    assert other.post(path, {"name":"X","item_type":"t","item_location":"A","price":1}).status_code == 403
+    assert admin.get(f"/api/groceries/{grocery['uid']}/?fields=name,responsible_supplier_id").json() == {"name":"Corner","responsible_supplier_id":grocery["responsible_supplier_id"]}
+    orphan = admin.post("/api/groceries/", {"name":"Orphan","location":"Side St"}).json()
+    assert "responsible_supplier_id" not in admin.get(f"/api/groceries/{orphan['uid']}/").json()
+    assert admin.get(f"/api/groceries/{orphan['uid']}/?fields=name,responsible_supplier_id").json() == {"name":"Orphan"}
+
+def test_incomes_dashboard_and_series(supplier_grocery):
+    admin, supplier, grocery = supplier_grocery
+    uid = grocery["uid"]
+    for day, amount in (("2025-03-03", 10.0), ("2025-03-04", 5.0), ("2025-03-12", 7.5)):
+        assert supplier.post(f"/api/groceries/{uid}/incomes/", {"amount":amount,"date":day}).status_code == 201
+    assert supplier.get(f"/api/groceries/{uid}/incomes/").status_code == 403
+    incomes = supplier.get(f"/api/groceries/{uid}/incomes/?mine=1&from=2025-03-04").json()
+    assert (incomes["count"], incomes["total"]) == (2, 12.5)
+    supplier.post(f"/api/groceries/{uid}/items/", {"name":"Tea","item_type":"drink","item_location":"A1","price":3.0})
+    dash = supplier.get("/api/accounts/me/groceries/").json()["groceries"]
+    assert [(g["uid"], g["item_count"], g["income_count"], g["income_total"]) for g in dash] == [(uid, 1, 3, 22.5)]
+    compact = supplier.get("/api/accounts/me/groceries/?from=20250304").json()
+    assert compact["from"] == "2025-03-04" and compact["groceries"][0]["income_total"] == 12.5
+    weekly = admin.get(f"/api/groceries/{uid}/incomes/series/?bucket=week&from=2025-03-03&to=2025-03-16&window=2").json()
+    assert weekly["buckets"] == ["2025-03-03", "2025-03-10"]
+    assert weekly["series"][0]["total"] == [15.0, 7.5]
+
+def test_change_feed_and_background_delete(supplier_grocery, settings):
+    from groceries import deletion
+    admin, supplier, grocery = supplier_grocery
+    uid = grocery["uid"]
+    item = supplier.post(f"/api/groceries/{uid}/items/", {"name":"Tea","item_type":"drink","item_location":"A1","price":3.0}).json()
+    # rows newer than the safety lag wait for a later call, so the watermark never passes an uncommitted write
+    settings.CHANGE_FEED_SAFETY_LAG_SECONDS = 60
+    assert admin.get("/api/changes/").json() == {"since":0.0,"watermark":0.0,"has_more":False,"groceries":[],"items":[],"tombstones":[]}
+    settings.CHANGE_FEED_SAFETY_LAG_SECONDS = 0
+    feed = admin.get("/api/changes/").json()
+    assert [g["uid"] for g in feed["groceries"]] == [uid]
+    assert [(i["uid"], i["grocery_uid"]) for i in feed["items"]] == [(item["uid"], uid)]
+    assert admin.delete(f"/api/groceries/{uid}/").status_code == 202
+    assert admin.get(f"/api/groceries/{uid}/").status_code == 404
+    deletion._executor.submit(lambda: None).result()  # wait for the background purge
+    assert admin.get(f"/api/groceries/{uid}/deletion/").json()["status"] == "deleted"
+    later = admin.get(f"/api/changes/?since={feed['watermark']}").json()
+    assert [(t["kind"], t["uid"]) for t in later["tombstones"]] == [("grocery", uid)]
+
+def test_atomic_batch_rolls_back_on_write_error(supplier_grocery, monkeypatch):
+    from groceries.serializers import ItemSerializer
+    _, supplier, grocery = supplier_grocery
+    path = f"/api/groceries/{grocery['uid']}/items/"
+    op = {"method":"POST","path":path,"body":{"name":"Tea","item_type":"drink","item_location":"A1","price":3.0}}
+    resp = supplier.post("/api/batch/", {"operations":[op, op]}, format="json")
+    assert [r["status"] for r in resp.json()["results"]] == [201, 201]
+    create = ItemSerializer.create
+    calls = []
+    def flaky(self, validated_data):
+        calls.append(1)
+        if len(calls) == 2:
+            raise RuntimeError("boom")
+        return create(self, validated_data)
+    monkeypatch.setattr(ItemSerializer, "create", flaky)
+    resp = supplier.post("/api/batch/", {"operations":[op, op]}, format="json")
+    assert resp.status_code == 500
+    assert len(supplier.get(path).json()) == 2
+
+def test_schema_served_from_prebuilt_artifact_with_etag(settings, tmp_path):
+    from django.test import Client
+    from grocery_graph import schema
+    settings.OPENAPI_SCHEMA_DIR = str(tmp_path)
+    schema.write_artifacts()
+    schema.reset()
+    client = Client()
+    resp = client.get("/api/schema/", HTTP_ACCEPT_ENCODING="gzip")
+    assert resp.status_code == 200 and resp["Content-Encoding"] == "gzip"
+    assert resp.content == (tmp_path / "openapi.yaml.gz").read_bytes()
+    assert client.get("/api/schema/", HTTP_IF_NONE_MATCH=resp["ETag"]).status_code == 304
+    body = client.get("/api/schema/?format=json")
+    assert body.json()["info"]["title"] == "Grocery Graph API"
+    assert body.json()["components"]["securitySchemes"]["jwtAuth"]["scheme"] == "bearer"
+    assert body.json()["paths"]["/api/groceries/"]["get"]["security"] == [{"jwtAuth": []}]
+    assert body["ETag"] != resp["ETag"]
+    schema.reset()
+
+# neomodel, the Bolt driver and numpy (a driver extra) are the neo4j backend itself, so only memory skips them
+LAZY_MODULES = {
+    "memory": ("drf_spectacular.views", "drf_spectacular.generators", "neomodel", "neo4j", "numpy"),
+    "neo4j": ("drf_spectacular.views", "drf_spectacular.generators"),
+}
+# best-of-3 django.setup() + URLconf import on an idle machine, measured per GRAPH_BACKEND; neo4j is the
+# production default and needs no server here (neomodel connects on first query, as in `build_schema`)
+STARTUP_BASELINE_SECONDS = {"memory": 0.29, "neo4j": 0.42}
+STARTUP_TOLERANCE = 1.3  # a return to the pre-lazy-import ~0.5-0.65s fails either budget
+
+def _cold_start(backend):
+    """(seconds, lazy modules loaded) for a fresh worker process on `backend`."""
+    import json, subprocess, sys
+    from django.conf import settings
+    script = (
+        "import json, sys, time; t = time.perf_counter(); import django; django.setup(); import grocery_graph.urls; "
+        f"print(json.dumps([time.perf_counter() - t, [m for m in {LAZY_MODULES[backend]!r} if m in sys.modules]]))"
+    )
+    env = {**os.environ, "DJANGO_SETTINGS_MODULE": "grocery_graph.settings", "GRAPH_BACKEND": backend}
+    return json.loads(subprocess.run([sys.executable, "-c", script], env=env, cwd=settings.BASE_DIR,
+                                     capture_output=True, text=True, check=True).stdout)
+
+@pytest.mark.parametrize("backend", ["neo4j", "memory"])
+def test_cold_start_imports_stay_lazy(backend):
+    assert _cold_start(backend)[1] == []
+
+# wall-clock budgets only hold on an otherwise idle machine, so they are opt-in and meant to run serially
+@pytest.mark.skipif(not os.getenv("TEST_STARTUP_BUDGET"), reason="set TEST_STARTUP_BUDGET=1 to time cold start")
+@pytest.mark.parametrize("backend", ["neo4j", "memory"])
+def test_cold_start_budget(backend):
+    assert min(_cold_start(backend)[0] for _ in range(3)) < STARTUP_BASELINE_SECONDS[backend] * STARTUP_TOLERANCE
+
+@pytest.mark.django_db
+def test_change_feed_rejects_non_finite_since_and_keeps_ties_together(graph_backend):
+    client = _client_for(User.objects.create_user(username="ties", email="ties@example.com", name="Ties", password="pass", role="SUPPLIER"))
+    assert client.get("/api/changes/?since=nan").status_code == 400
+    assert client.get("/api/changes/?since=inf").status_code == 400
+    uids = []
+    for n, at in enumerate((100.0, 200.0, 200.0, 300.0)):
+        grocery = graph_backend.create_grocery({"name":f"G{n}","location":"L"})
+        grocery.updated_at = at
+        grocery.save()
+        uids.append(grocery.uid)
+    page = client.get("/api/changes/?limit=2").json()
+    # both groceries at 200.0 arrive together, so resuming after 200.0 skips neither
+    assert sorted(g["uid"] for g in page["groceries"]) == sorted(uids[:3])
+    assert (page["watermark"], page["has_more"]) == (200.0, True)
+    page = client.get(f"/api/changes/?limit=2&since={page['watermark']}").json()
+    assert [g["uid"] for g in page["groceries"]] == uids[3:]
+
+def test_backfill_puts_unstamped_rows_in_the_change_feed(supplier_grocery, graph_backend, settings):
+    import io
+    from django.core.management import call_command
+    admin, supplier, grocery = supplier_grocery
+    item = supplier.post(f"/api/groceries/{grocery['uid']}/items/", {"name":"Tea","item_type":"drink","item_location":"A1","price":3.0}).json()
+    # as written before the change feed existed
+    for node in (graph_backend.get_grocery(grocery["uid"]), graph_backend.get_item(item["uid"])):
+        node.updated_at = None
+        node.save()
+    settings.CHANGE_FEED_SAFETY_LAG_SECONDS = 0
+    assert admin.get("/api/changes/").json()["items"] == []
+    call_command("backfill_updated_at", batch_size=1, stdout=io.StringIO())
+    feed = admin.get("/api/changes/").json()
+    assert [(g["uid"], g["updated_at"]) for g in feed["groceries"]] == [(grocery["uid"], grocery["created_at"])]
+    assert [i["uid"] for i in feed["items"]] == [item["uid"]]
+
+def test_batch_operations_on_the_same_item_build_on_each_other(supplier_grocery):
+    _, supplier, grocery = supplier_grocery
+    path = f"/api/groceries/{grocery['uid']}/items/"
+    item = supplier.post(path, {"name":"Tea","item_type":"drink","item_location":"A1","price":3.0}).json()
+    item_path = f"{path}{item['uid']}/"
+    resp = supplier.post("/api/batch/", {"mode":"best_effort","operations":[
+        {"method":"PATCH","path":item_path,"body":{"price":4.0}},
+        {"method":"PATCH","path":item_path,"body":{"name":"Green tea"}},
+        {"method":"DELETE","path":item_path},
+        {"method":"PATCH","path":item_path,"body":{"price":5.0}},
+    ]}, format="json")
+    assert [r["status"] for r in resp.json()["results"]] == [200, 200, 204, 409]
+    [stored] = supplier.get(path + "?include_deleted=1").json()
+    assert (stored["name"], stored["price"], stored["is_deleted"]) == ("Green tea", 4.0, True)
@@ -1,10 +1,15 @@
 from django.urls import path
-from .views import GroceryListCreateView, GroceryDetailView, GroceryItemsView, GroceryItemDetailView, GroceryIncomeView
+from .views import GroceryListCreateView, GroceryDetailView, GroceryDeletionStatusView, GroceryItemsView, GroceryItemDetailView, GroceryIncomeView, GroceryIncomeSeriesView, ChangeFeedView, BatchView, StatsView
 
 urlpatterns = [
+    path("batch/", BatchView.as_view(), name="batch"),
+    path("changes/", ChangeFeedView.as_view(), name="changes"),
+    path("stats/", StatsView.as_view(), name="stats"),
     path("groceries/", GroceryListCreateView.as_view(), name="groceries"),
     path("groceries/<str:grocery_uid>/", GroceryDetailView.as_view(), name="grocery_detail"),
+    path("groceries/<str:grocery_uid>/deletion/", GroceryDeletionStatusView.as_view(), name="grocery_deletion"),
     path("groceries/<str:grocery_uid>/items/", GroceryItemsView.as_view(), name="grocery_items"),
     path("groceries/<str:grocery_uid>/items/<str:item_uid>/", GroceryItemDetailView.as_view(), name="grocery_item_detail"),
     path("groceries/<str:grocery_uid>/incomes/", GroceryIncomeView.as_view(), name="grocery_income"),
+    path("groceries/<str:grocery_uid>/incomes/series/", GroceryIncomeSeriesView.as_view(), name="grocery_income_series"),
 ]
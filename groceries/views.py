@@ -1,17 +1,39 @@
+import json
+import math
+import time
+from datetime import date, datetime
+from django.conf import settings
+from django.urls import resolve, Resolver404
+from grocery_graph import admission
 from rest_framework import permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from .serializers import GrocerySerializer, ItemSerializer, DailyIncomeSerializer
-from .permissions import user_is_responsible_for_grocery
-from .graph_nodes import GroceryNode, ItemNode, DailyIncomeNode
+from .permissions import user_is_responsible_for_grocery, IsAdminRole
+from . import series
+from .backends import get_backend
+from .deletion import schedule_purge, deletion_status
+from .coalescing import coalesced_read, read_flight
+from .rows import GROCERY, GROCERY_DETAIL, ITEM, INCOME, json_response
+
+def get_live_grocery(uid):
+    """The grocery with this uid, or None if it does not exist or is being deleted."""
+    grocery = get_backend().get_grocery(uid)
+    return None if grocery is None or grocery.deleting_at else grocery
+
+def soft_delete_item(item):
+    item.is_deleted = True
+    item.deleted_at = datetime.utcnow()
+    item.touch()
 
 class GroceryListCreateView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        groceries = GroceryNode.nodes.all()
-        data = [{"uid":g.uid,"name":g.name,"location":g.location,"created_at":g.created_at,"updated_at":g.updated_at} for g in groceries]
-        return Response(data)
+        res = GROCERY.select(request.query_params.get("fields"))
+        records = coalesced_read("grocery_rows", res)
+        rows = res.rows(records)
+        return json_response(request, lambda: res.encode_list(rows), lambda: [res.to_dict(r) for r in rows])
 
     def post(self, request):
         serializer = GrocerySerializer(data=request.data, context={"request": request})
@@ -25,12 +47,21 @@ class GroceryDetailView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self, grocery_uid):
-        try:
-            return GroceryNode.nodes.get(uid=grocery_uid)
-        except GroceryNode.DoesNotExist:
-            return None
+        return get_live_grocery(grocery_uid)
 
     def get(self, request, grocery_uid):
+        if request.query_params.get("fields"):
+            res = GROCERY_DETAIL.select(request.query_params["fields"])
+            records = get_backend().grocery_detail_rows(res, grocery_uid)
+            if not records:
+                return Response({"detail":"Not found."}, status=status.HTTP_404_NOT_FOUND)
+            row = res.rows(records)[0]
+            if "responsible_supplier_id" in res.fields and row.responsible_supplier_id is None:
+                # GrocerySerializer leaves the key out when there is no supplier
+                data = res.to_dict(row)
+                del data["responsible_supplier_id"]
+                return Response(data)
+            return json_response(request, lambda: res.encode_row(row), lambda: res.to_dict(row))
         g = self.get_object(grocery_uid)
         if not g:
             return Response({"detail":"Not found."}, status=status.HTTP_404_NOT_FOUND)
@@ -53,26 +84,34 @@ class GroceryDetailView(APIView):
         g = self.get_object(grocery_uid)
         if not g:
             return Response({"detail":"Not found."}, status=status.HTTP_404_NOT_FOUND)
-        g.delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
+        # hide it and tombstone it now; children are removed in batches in the background
+        get_backend().mark_deleting(g)
+        schedule_purge(grocery_uid)
+        return Response({"uid":grocery_uid,"status":"deleting"}, status=status.HTTP_202_ACCEPTED)
+
+class GroceryDeletionStatusView(APIView):
+    permission_classes = [IsAdminRole]
+
+    def get(self, request, grocery_uid):
+        progress = deletion_status(grocery_uid)
+        if not progress:
+            return Response({"detail":"No deletion found for this grocery."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(progress)
 
 class GroceryItemsView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_grocery(self, uid):
-        try:
-            return GroceryNode.nodes.get(uid=uid)
-        except GroceryNode.DoesNotExist:
-            return None
+        return get_live_grocery(uid)
 
     def get(self, request, grocery_uid):
-        grocery = self.get_grocery(grocery_uid)
-        if not grocery:
-            return Response({"detail":"Grocery not found."}, status=status.HTTP_404_NOT_FOUND)
         include_deleted = request.query_params.get("include_deleted") in ("1","true","True")
-        items = [i for i in grocery.items.all() if (include_deleted or not i.is_deleted)]
-        data = [ItemSerializer(i).data for i in items]
-        return Response(data)
+        res = ITEM.select(request.query_params.get("fields"))
+        records = coalesced_read("grocery_item_rows", res, grocery_uid, include_deleted)
+        if not records:
+            return Response({"detail":"Grocery not found."}, status=status.HTTP_404_NOT_FOUND)
+        rows = res.rows([r for r in records if r[0]], skip=1)
+        return json_response(request, lambda: res.encode_list(rows), lambda: [res.to_dict(r) for r in rows])
 
     def post(self, request, grocery_uid):
         grocery = self.get_grocery(grocery_uid)
@@ -89,15 +128,12 @@ class GroceryItemDetailView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_grocery_and_item(self, grocery_uid, item_uid):
-        try:
-            grocery = GroceryNode.nodes.get(uid=grocery_uid)
-        except GroceryNode.DoesNotExist:
+        grocery = get_live_grocery(grocery_uid)
+        if not grocery:
             return None, None
-        try:
-            item = ItemNode.nodes.get(uid=item_uid)
-        except ItemNode.DoesNotExist:
-            return grocery, None
-        if not grocery.items.is_connected(item):
+        backend = get_backend()
+        item = backend.get_item(item_uid)
+        if not item or not backend.grocery_has_item(grocery, item):
             return grocery, None
         return grocery, item
 
@@ -118,39 +154,34 @@ class GroceryItemDetailView(APIView):
             return Response({"detail":"Not found."}, status=status.HTTP_404_NOT_FOUND)
         if request.user.role != "ADMIN" and not user_is_responsible_for_grocery(request.user.id, grocery_uid):
             return Response({"detail":"Not allowed."}, status=status.HTTP_403_FORBIDDEN)
-        from datetime import datetime
-        item.is_deleted = True
-        item.deleted_at = datetime.utcnow()
-        item.touch()
+        soft_delete_item(item)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 class GroceryIncomeView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_grocery(self, uid):
-        try:
-            return GroceryNode.nodes.get(uid=uid)
-        except GroceryNode.DoesNotExist:
-            return None
+        return get_live_grocery(uid)
 
     def get(self, request, grocery_uid):
         grocery = self.get_grocery(grocery_uid)
         if not grocery:
             return Response({"detail":"Grocery not found."}, status=status.HTTP_404_NOT_FOUND)
         mine = request.query_params.get("mine") in ("1","true","True")
-        print("Runtime user_is_responsible_for_grocery(request.user.id, grocery_uid): ", user_is_responsible_for_grocery(request.user.id, grocery_uid))
         if request.user.role != "ADMIN":
             if not mine or not user_is_responsible_for_grocery(request.user.id, grocery_uid):
                 return Response({"detail":"Only ADMIN can read incomes of other groceries."}, status=status.HTTP_403_FORBIDDEN)
-        date_from = request.query_params.get("from")
-        date_to = request.query_params.get("to")
-        incomes = grocery.incomes.all()
-        if date_from:
-            incomes = [i for i in incomes if i.date >= date_from]
-        if date_to:
-            incomes = [i for i in incomes if i.date <= date_to]
-        total = sum(i.amount for i in incomes)
-        return Response({"grocery_uid":grocery.uid,"count":len(incomes),"total":total,"incomes":[DailyIncomeSerializer(i).data for i in incomes]})
+        res = INCOME.select(request.query_params.get("fields"))
+        date_from = request.query_params.get("from") or None
+        date_to = request.query_params.get("to") or None
+        records = get_backend().grocery_income_rows(res, grocery_uid, date_from, date_to)
+        rows = res.rows(records, skip=1)
+        head = {"grocery_uid":grocery.uid,"count":len(rows),"total":sum(r[0] for r in records)}
+        return json_response(
+            request,
+            lambda: json.dumps(head, ensure_ascii=False, separators=(",", ":"))[:-1] + ',"incomes":' + res.encode_list(rows) + "}",
+            lambda: {**head, "incomes": [res.to_dict(r) for r in rows]},
+        )
 
     def post(self, request, grocery_uid):
         grocery = self.get_grocery(grocery_uid)
@@ -162,3 +193,216 @@ class GroceryIncomeView(APIView):
         serializer.is_valid(raise_exception=True)
         income = serializer.save()
         return Response(DailyIncomeSerializer(income).data, status=status.HTTP_201_CREATED)
+
+class GroceryIncomeSeriesView(APIView):
+    """Income per day/week/month for one grocery (plus any in `?groceries=`), zero-filled,
+    with a trailing moving average and period-over-period deltas."""
+    permission_classes = [permissions.IsAuthenticated]
+    MAX_GROCERIES = 10
+
+    def get(self, request, grocery_uid):
+        params = request.query_params
+        bucket = params.get("bucket", "day")
+        if bucket not in series.BUCKETS:
+            return Response({"detail":"bucket must be one of day, week, month."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            date_to = date.fromisoformat(params["to"]) if params.get("to") else None
+            date_from = date.fromisoformat(params["from"]) if params.get("from") else None
+            window = int(params.get("window") or series.DEFAULT_WINDOW[bucket])
+        except ValueError:
+            return Response({"detail":"from/to must be YYYY-MM-DD and window an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        if window < 1:
+            return Response({"detail":"window must be positive."}, status=status.HTTP_400_BAD_REQUEST)
+        if not date_from:
+            date_from, date_to = series.default_range(bucket, date_to)
+        date_to = date_to or date.today()
+        buckets = series.bucket_starts(date_from, date_to, bucket)
+        if not buckets or len(buckets) > settings.INCOME_SERIES_MAX_BUCKETS:
+            return Response({"detail":f"from/to must span 1 to {settings.INCOME_SERIES_MAX_BUCKETS} buckets."}, status=status.HTTP_400_BAD_REQUEST)
+
+        uids = [grocery_uid] + [u for u in (params.get("groceries") or "").split(",") if u and u != grocery_uid]
+        uids = list(dict.fromkeys(uids))
+        if len(uids) > self.MAX_GROCERIES:
+            return Response({"detail":f"At most {self.MAX_GROCERIES} groceries per call."}, status=status.HTTP_400_BAD_REQUEST)
+        for uid in uids:
+            if not get_live_grocery(uid):
+                return Response({"detail":f"Grocery {uid} not found."}, status=status.HTTP_404_NOT_FOUND)
+            if request.user.role != "ADMIN" and not user_is_responsible_for_grocery(request.user.id, uid):
+                return Response({"detail":f"Only ADMIN can read incomes of other groceries ({uid})."}, status=status.HTTP_403_FORBIDDEN)
+
+        records = get_backend().income_series_rows(bucket, uids, date_from.isoformat(), date_to.isoformat())
+        return Response({
+            "bucket": bucket, "from": date_from.isoformat(), "to": date_to.isoformat(), "window": window,
+            "buckets": buckets, "series": series.build_series(uids, buckets, records, window),
+        })
+
+class ChangeFeedView(APIView):
+    """Groceries and items changed after `?since=<watermark>`, plus tombstones for deletions.
+
+    Pass the returned `watermark` as the next `since`; repeat while `has_more` is true.
+    A stream may return more than `limit` rows when several share the last timestamp.
+    Rows stamped within CHANGE_FEED_SAFETY_LAG_SECONDS are held back until a later call: their
+    timestamps are taken before commit, so a write still in flight may yet land below them.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        try:
+            since = float(request.query_params.get("since") or 0)
+            limit = min(int(request.query_params.get("limit") or settings.CHANGE_FEED_PAGE_SIZE), settings.CHANGE_FEED_PAGE_SIZE)
+        except ValueError:
+            return Response({"detail":"since must be a timestamp and limit an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        if not math.isfinite(since):
+            return Response({"detail":"since must be a finite timestamp."}, status=status.HTTP_400_BAD_REQUEST)
+        if limit < 1:
+            return Response({"detail":"limit must be positive."}, status=status.HTTP_400_BAD_REQUEST)
+        until = time.time() - settings.CHANGE_FEED_SAFETY_LAG_SECONDS
+        grocery_rows, item_rows, tombstone_rows = get_backend().changed_rows(GROCERY, ITEM, since, until, limit)
+
+        groceries, items, tombstones = [], [], []
+        for row in GROCERY.rows(grocery_rows, skip=1):
+            groceries.append(GROCERY.to_dict(row))
+        for record, i in zip(item_rows, ITEM.rows(item_rows, skip=2)):
+            if i.is_deleted:
+                tombstones.append({"kind":"item","uid":i.uid,"grocery_uid":record[1],"deleted_at":record[0]})
+            else:
+                items.append({**ITEM.to_dict(i), "grocery_uid": record[1]})
+        for updated_at, kind, ref_uid in tombstone_rows:
+            tombstones.append({"kind":kind,"uid":ref_uid,"deleted_at":updated_at})
+
+        # A truncated stream caps the watermark at its last row so nothing past it is skipped;
+        # rows from other streams beyond that point are simply sent again next time.
+        streams = [[row[0] for row in rows] for rows in (grocery_rows, item_rows, tombstone_rows)]
+        truncated = [ts[-1] for ts in streams if len(ts) >= limit]
+        seen = [t for ts in streams for t in ts]
+        watermark = min(truncated) if truncated else max(seen, default=since)
+        return Response({
+            "since": since, "watermark": watermark, "has_more": bool(truncated),
+            "groceries": groceries, "items": items, "tombstones": tombstones,
+        })
+
+class BatchView(APIView):
+    """Run many item/income writes in one request and one Neo4j write transaction.
+
+    Body: {"mode": "atomic"|"best_effort", "operations": [{"method", "path", "body"}, ...]}
+    where each path is one of the existing grocery item/income routes. Every operation is
+    resolved, permission-checked (once per grocery) and validated before anything is written.
+    In atomic mode a single invalid operation rejects the whole batch; in best_effort mode
+    invalid operations are reported and the rest still run. Operations on the same item apply
+    in order; one after a delete of that item is rejected with 409. A database error while
+    writing rolls the transaction back in either mode.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    # (view class, method) -> operation kind
+    SUPPORTED = {
+        (GroceryItemsView, "POST"): "create_item",
+        (GroceryItemDetailView, "PATCH"): "update_item",
+        (GroceryItemDetailView, "DELETE"): "delete_item",
+        (GroceryIncomeView, "POST"): "create_income",
+    }
+
+    def post(self, request):
+        mode = request.data.get("mode", "atomic")
+        operations = request.data.get("operations")
+        if mode not in ("atomic", "best_effort"):
+            return Response({"detail":"mode must be 'atomic' or 'best_effort'."}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(operations, list) or not operations:
+            return Response({"detail":"operations must be a non-empty list."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(operations) > settings.BATCH_MAX_OPERATIONS:
+            return Response({"detail":f"At most {settings.BATCH_MAX_OPERATIONS} operations per batch."}, status=status.HTTP_400_BAD_REQUEST)
+
+        self._groceries, self._items, self._deleted = {}, {}, set()
+        results, prepared = [], []
+        for index, op in enumerate(operations):
+            result = {"index": index, "status": None, "body": None}
+            results.append(result)
+            outcome = self.prepare(request, op)
+            if isinstance(outcome, tuple):
+                result["status"], result["body"] = outcome
+            else:
+                prepared.append((result, outcome))
+
+        if mode == "atomic" and len(prepared) < len(operations):
+            for result, _ in prepared:
+                result["status"], result["body"] = status.HTTP_424_FAILED_DEPENDENCY, {"detail":"Not executed: another operation failed."}
+            return Response({"mode": mode, "results": results}, status=status.HTTP_400_BAD_REQUEST)
+        if not prepared:
+            return Response({"mode": mode, "results": results})
+
+        current = None
+        try:
+            with get_backend().write_transaction():
+                for current, run in prepared:
+                    current["status"], current["body"] = run()
+        except Exception:
+            for result, _ in prepared:
+                result["status"], result["body"] = status.HTTP_424_FAILED_DEPENDENCY, {"detail":"Rolled back: another operation failed."}
+            current["status"], current["body"] = status.HTTP_500_INTERNAL_SERVER_ERROR, {"detail":"Write failed; batch rolled back."}
+            return Response({"mode": mode, "results": results}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response({"mode": mode, "results": results})
+
+    def grocery_access(self, request, grocery_uid):
+        # one lookup and one permission check per grocery, however many operations target it
+        if grocery_uid not in self._groceries:
+            grocery = get_live_grocery(grocery_uid)
+            allowed = bool(grocery) and (request.user.role == "ADMIN" or user_is_responsible_for_grocery(request.user.id, grocery_uid))
+            self._groceries[grocery_uid] = (grocery, allowed)
+        return self._groceries[grocery_uid]
+
+    def item_access(self, grocery, item_uid):
+        # one shared node per item, so later operations on it build on earlier ones when run
+        if item_uid not in self._items:
+            item = get_backend().get_item(item_uid)
+            self._items[item_uid] = item if item and get_backend().grocery_has_item(grocery, item) else None
+        return self._items[item_uid]
+
+    def prepare(self, request, op):
+        """Return a callable that performs the write, or a (status, body) error tuple."""
+        if not isinstance(op, dict):
+            return status.HTTP_400_BAD_REQUEST, {"detail":"Operation must be an object."}
+        method = str(op.get("method", "")).upper()
+        try:
+            match = resolve(str(op.get("path", "")))
+        except Resolver404:
+            return status.HTTP_404_NOT_FOUND, {"detail":"Unknown path."}
+        kind = self.SUPPORTED.get((getattr(match.func, "view_class", None), method))
+        if not kind:
+            return status.HTTP_405_METHOD_NOT_ALLOWED, {"detail":"Operation not supported in a batch."}
+
+        grocery, allowed = self.grocery_access(request, match.kwargs["grocery_uid"])
+        if not grocery:
+            return status.HTTP_404_NOT_FOUND, {"detail":"Grocery not found."}
+        if not allowed:
+            return status.HTTP_403_FORBIDDEN, {"detail":"Not allowed."}
+
+        item = None
+        if kind in ("update_item", "delete_item"):
+            item = self.item_access(grocery, match.kwargs["item_uid"])
+            if not item:
+                return status.HTTP_404_NOT_FOUND, {"detail":"Not found."}
+            if item.uid in self._deleted:
+                return status.HTTP_409_CONFLICT, {"detail":"Item is deleted by an earlier operation in this batch."}
+        if kind == "delete_item":
+            self._deleted.add(item.uid)
+            def run():
+                soft_delete_item(item)
+                return status.HTTP_204_NO_CONTENT, None
+            return run
+
+        body = op.get("body") or {}
+        if kind == "create_item":
+            serializer, out = ItemSerializer(data=body, context={"grocery":grocery}), ItemSerializer
+        elif kind == "update_item":
+            serializer, out = ItemSerializer(item, data=body, partial=True), ItemSerializer
+        else:
+            serializer, out = DailyIncomeSerializer(data=body, context={"grocery":grocery}), DailyIncomeSerializer
+        if not serializer.is_valid():
+            return status.HTTP_400_BAD_REQUEST, serializer.errors
+        ok = status.HTTP_200_OK if kind == "update_item" else status.HTTP_201_CREATED
+        return lambda: (ok, out(serializer.save()).data)
+
+class StatsView(APIView):
+    permission_classes = [IsAdminRole]
+
+    def get(self, request):
+        return Response({"read_coalescing": read_flight.stats(), "admission": admission.stats()})
@@ -0,0 +1,111 @@
+"""Admission control in front of the Neo4j-bound API.
+
+Each request class (read, write, bulk) gets a fixed number of concurrent slots and a
+small bounded wait queue. When the queue is full, or a queued request waits longer than
+its timeout, the request is shed with 503 + Retry-After instead of piling up behind the
+Neo4j connection pool. Bulk requests also step aside while reads are queued, so cheap
+GETs keep flowing during an import. Configured by ADMISSION_CONTROL in settings.
+"""
+import re
+import threading
+import time
+from django.conf import settings
+from django.http import JsonResponse
+
+# how often a bulk waiter re-checks whether reads are still queued
+_PRIORITY_POLL = 0.05
+
+class Gate:
+    def __init__(self, name, concurrency, queue, timeout):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue = queue
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def _blocked(self, yield_to):
+        return self.active >= self.concurrency or any(g.waiting for g in yield_to)
+
+    def acquire(self, yield_to=()):
+        """Take a slot, waiting in the queue if needed; False means the request must be shed."""
+        with self._cond:
+            if not self._blocked(yield_to):
+                self.active += 1
+                self.admitted += 1
+                return True
+            if self.waiting >= self.queue:
+                self.rejected += 1
+                return False
+            self.waiting += 1
+            deadline = time.monotonic() + self.timeout
+            try:
+                while self._blocked(yield_to):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timed_out += 1
+                        return False
+                    self._cond.wait(min(remaining, _PRIORITY_POLL) if yield_to else remaining)
+                self.active += 1
+                self.admitted += 1
+                return True
+            finally:
+                self.waiting -= 1
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "concurrency": self.concurrency, "queue_limit": self.queue,
+                "active": self.active, "queued": self.waiting,
+                "admitted": self.admitted, "rejected": self.rejected, "timed_out": self.timed_out,
+            }
+
+gates = {}
+
+def stats():
+    return {name: gate.stats() for name, gate in gates.items()}
+
+class AdmissionControlMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        conf = settings.ADMISSION_CONTROL
+        self.enabled = conf["ENABLED"]
+        self.retry_after = str(conf["RETRY_AFTER"])
+        self.guarded = [re.compile(p) for p in conf["GUARDED_PATHS"]]
+        self.exempt = [re.compile(p) for p in conf["EXEMPT_PATHS"]]
+        self.bulk = [re.compile(p) for p in conf["BULK_PATHS"]]
+        gates.clear()
+        for name, limits in conf["CLASSES"].items():
+            gates[name] = Gate(name, limits["concurrency"], limits["queue"], limits["timeout"])
+
+    def classify(self, request):
+        path = request.path
+        if not any(p.search(path) for p in self.guarded) or any(p.search(path) for p in self.exempt):
+            return None
+        if any(p.search(path) for p in self.bulk):
+            return "bulk"
+        return "read" if request.method in ("GET", "HEAD", "OPTIONS") else "write"
+
+    def __call__(self, request):
+        kind = self.classify(request) if self.enabled else None
+        if kind is None:
+            return self.get_response(request)
+        gate = gates[kind]
+        yield_to = (gates["read"],) if kind == "bulk" else ()
+        if not gate.acquire(yield_to):
+            response = JsonResponse({"detail":"Server is busy, retry later."}, status=503)
+            response["Retry-After"] = self.retry_after
+            return response
+        try:
+            return self.get_response(request)
+        finally:
+            gate.release()
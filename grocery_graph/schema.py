@@ -0,0 +1,100 @@
+"""OpenAPI schema served from a prebuilt artifact.
+
+drf-spectacular walks every view and serializer to build the schema, far too much work
+to repeat on each /api/schema/ hit from the Swagger/Redoc pages. `manage.py build_schema`
+renders it once (at image build or container start) into OPENAPI_SCHEMA_DIR as YAML and
+JSON plus gzip copies. Workers load those files on first request and answer with an
+ETag (304 on revalidation) and the precompressed body. Without an artifact the schema is
+generated once per process instead. drf-spectacular is only imported to generate.
+"""
+import gzip
+import hashlib
+import threading
+from pathlib import Path
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from django.utils.module_loading import import_string
+from django.views.decorators.http import require_safe
+
+FORMATS = {"yaml": "application/vnd.oai.openapi", "json": "application/vnd.oai.openapi+json"}
+
+class SchemaArtifact:
+    def __init__(self, body, gzipped=None):
+        self.body = body
+        self.gzipped = gzipped if gzipped is not None else gzip.compress(body, mtime=0)
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        # gzip and identity bodies are different representations, so they get different strong ETags
+        self.etag = f'"{digest}"'
+        self.gzip_etag = f'"{digest}-gz"'
+
+def render_schema():
+    """Generate the schema with drf-spectacular: {format: bytes}."""
+    from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+    from drf_spectacular.settings import spectacular_settings
+    import accounts.schema  # noqa: F401  registers the authentication extension
+    schema = spectacular_settings.DEFAULT_GENERATOR_CLASS().get_schema(request=None, public=spectacular_settings.SERVE_PUBLIC)
+    return {"yaml": OpenApiYamlRenderer().render(schema), "json": OpenApiJsonRenderer().render(schema)}
+
+def write_artifacts(directory=None):
+    directory = Path(directory or settings.OPENAPI_SCHEMA_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    artifacts = {fmt: SchemaArtifact(body) for fmt, body in render_schema().items()}
+    for fmt, artifact in artifacts.items():
+        (directory / f"openapi.{fmt}").write_bytes(artifact.body)
+        (directory / f"openapi.{fmt}.gz").write_bytes(artifact.gzipped)
+    return artifacts
+
+def _read_artifacts(directory):
+    paths = {fmt: (directory / f"openapi.{fmt}", directory / f"openapi.{fmt}.gz") for fmt in FORMATS}
+    if not all(p.exists() for pair in paths.values() for p in pair):
+        return None
+    return {fmt: SchemaArtifact(body.read_bytes(), gz.read_bytes()) for fmt, (body, gz) in paths.items()}
+
+_lock = threading.Lock()
+_artifacts = None
+
+def get_artifacts():
+    global _artifacts
+    if _artifacts is None:
+        with _lock:
+            if _artifacts is None:
+                _artifacts = _read_artifacts(Path(settings.OPENAPI_SCHEMA_DIR)) \
+                    or {fmt: SchemaArtifact(body) for fmt, body in render_schema().items()}
+    return _artifacts
+
+def reset():
+    global _artifacts
+    _artifacts = None
+
+@require_safe
+def schema_view(request):
+    """YAML by default; JSON for `?format=json` or a JSON Accept header, like SpectacularAPIView."""
+    fmt = "json" if request.GET.get("format") == "json" or "json" in request.headers.get("Accept", "") else "yaml"
+    artifact = get_artifacts()[fmt]
+    gzipped = "gzip" in request.headers.get("Accept-Encoding", "")
+    etag = artifact.gzip_etag if gzipped else artifact.etag
+    if {artifact.etag, artifact.gzip_etag, "*"}.intersection(parse_etags(request.headers.get("If-None-Match", ""))):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(artifact.gzipped if gzipped else artifact.body, content_type=FORMATS[fmt])
+        if gzipped:
+            response["Content-Encoding"] = "gzip"
+        response["Content-Disposition"] = f'inline; filename="{settings.SPECTACULAR_SETTINGS["TITLE"]}.{fmt}"'
+    response["ETag"] = etag
+    # always revalidate; an unchanged schema then costs a bodyless 304
+    response["Cache-Control"] = "no-cache"
+    patch_vary_headers(response, ("Accept", "Accept-Encoding"))
+    return response
+
+def lazy_view(path, **initkwargs):
+    """Import a class-based view on its first request instead of when the URLconf loads."""
+    view = None
+
+    def dispatch(request, *args, **kwargs):
+        nonlocal view
+        if view is None:
+            view = import_string(path).as_view(**initkwargs)
+        return view(request, *args, **kwargs)
+    return dispatch
@@ -0,0 +1,51 @@
+"""Import-time profile of a worker cold start (django.setup() + loading the URLconf).
+
+python profile_startup.py --top 25
+GRAPH_BACKEND=memory python profile_startup.py
+"""
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+STARTUP = (
+    "import os, django; os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'grocery_graph.settings'); "
+    "django.setup(); import grocery_graph.urls"
+)
+
+
+def profile():
+    """[(module, self_us, cumulative_us, depth)] from `python -X importtime`, in import order."""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", STARTUP],
+                         capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us), (len(name) - len(name.lstrip())) // 2))
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--top", type=int, default=20, help="Rows per table")
+    args = ap.parse_args()
+
+    rows = profile()
+    by_package = defaultdict(int)
+    for name, self_us, _, _ in rows:
+        by_package[name.split(".")[0]] += self_us
+    total = sum(by_package.values())
+    print(f"{len(rows)} modules, {total / 1000:.1f} ms importing (GRAPH_BACKEND={os.getenv('GRAPH_BACKEND', 'neo4j')})\n")
+    print(f"{'package':<32}{'self ms':>10}{'share':>8}")
+    for package, us in sorted(by_package.items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"{package:<32}{us / 1000:>10.1f}{100 * us / total:>7.1f}%")
+    print(f"\n{'first-level import':<48}{'cumulative ms':>14}")
+    for name, _, cumulative_us, _ in sorted((r for r in rows if r[3] == 0), key=lambda r: -r[2])[:args.top]:
+        print(f"{name:<48}{cumulative_us / 1000:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -79,7 +79,7 @@ class Client:
         return self.patch(f"/api/groceries/{uid}/", payload)
 
     def delete_grocery(self, uid: str):
-        return self.delete(f"/api/groceries/{uid}/")
+        return self.delete(f"/api/groceries/{uid}/", expect=202)
 
     def add_item(self, grocery_uid: str, name: str, item_type: str, item_location: str, price: float):
         return self.post(f"/api/groceries/{grocery_uid}/items/", {